@@ -6,15 +6,49 @@ Usage:
 """
 
 import argparse
+import asyncio
 import os
-import json
+import time
 from pathlib import Path
+
+import orjson
 from dotenv import load_dotenv
 
 from src.ttd_dr.agents.ttd_dr_agent import TTDDRAgent
 
 load_dotenv()
 
+# Report chunks are echoed live but written to disk in batches to avoid per-token writes.
+FLUSH_CHUNKS = 64
+FLUSH_INTERVAL = 0.2
+
+
+async def generate_report(agent: TTDDRAgent, args: argparse.Namespace, output_path: Path):
+    """Run research, then stream the final report to the terminal and the output file."""
+    state = await agent.aresearch(args.address, args.brief)
+    
+    with open(output_path, 'w') as f:
+        f.write(f"# Feasibility Study Report\n\n**Address:** {args.address}\n\n")
+        if args.brief:
+            f.write(f"**Brief:** {args.brief}\n\n")
+        f.write(f"**Generated:** {state.metadata.get('timestamp', 'N/A')}\n")
+        f.write(f"**Research Steps:** {len(state.search_history)}\n")
+        f.write(f"**Revisions:** {state.revision_count}\n\n---\n\n")
+        
+        print("\n📄 Final report:\n")
+        buffer, last_flush = [], time.monotonic()
+        async for chunk in agent.astream_final_report(state):
+            print(chunk, end="", flush=True)
+            buffer.append(chunk)
+            if len(buffer) >= FLUSH_CHUNKS or time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                f.write("".join(buffer))
+                f.flush()
+                buffer.clear()
+                last_flush = time.monotonic()
+        f.write("".join(buffer))
+    
+    return state
+
 
 def main():
     parser = argparse.ArgumentParser(description="Generate feasibility study reports using TTD-DR")
@@ -25,6 +59,7 @@ def main():
     parser.add_argument("--max-steps", type=int, default=3, help="Maximum search steps (default: 3 for demo, increase for comprehensive research)")
     parser.add_argument("--no-evolution", action="store_true", help="Disable self-evolution")
     parser.add_argument("--no-diffusion", action="store_true", help="Disable diffusion refinement")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the persistent LLM response cache")
     args = parser.parse_args()
     
     if not os.getenv("OPENAI_API_KEY"):
@@ -41,27 +76,19 @@ def main():
         model_name=args.model,
         max_search_steps=args.max_steps,
         use_self_evolution=not args.no_evolution,
-        use_diffusion=not args.no_diffusion
+        use_diffusion=not args.no_diffusion,
+        use_cache=not args.no_cache
     )
     
-    state = agent.run(args.address, args.brief)
-    
     output_path = Path(args.output)
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    with open(output_path, 'w') as f:
-        f.write(f"# Feasibility Study Report\n\n**Address:** {args.address}\n\n")
-        if args.brief:
-            f.write(f"**Brief:** {args.brief}\n\n")
-        f.write(f"**Generated:** {state.metadata.get('timestamp', 'N/A')}\n")
-        f.write(f"**Research Steps:** {len(state.search_history)}\n")
-        f.write(f"**Revisions:** {state.revision_count}\n\n---\n\n{state.final_report}")
+    state = asyncio.run(generate_report(agent, args, output_path))
     
     print(f"\n✅ Report: {output_path}")
     
     state_path = output_path.parent / f"{output_path.stem}_state.json"
-    with open(state_path, 'w') as f:
-        json.dump(state.to_dict(), f, indent=2)
+    state_path.write_bytes(orjson.dumps(state.to_dict(), option=orjson.OPT_INDENT_2))
     
     print(f"📊 State: {state_path}")
     print("\n" + "=" * 80)
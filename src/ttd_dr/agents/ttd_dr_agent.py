@@ -1,23 +1,79 @@
 """TTD-DR Agent - Test-Time Diffusion Deep Researcher."""
 
+import asyncio
+import io
 import os
+import re
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import numpy as np
 
 src_path = Path(__file__).parent.parent.parent
 if str(src_path) not in sys.path:
     sys.path.insert(0, str(src_path))
 
-from langchain_openai import ChatOpenAI
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_core.caches import InMemoryCache
 from langchain_core.prompts import ChatPromptTemplate
 
 from ttd_dr.planner.planner import ResearchPlanner
 from ttd_dr.memory.state import AgentState
 from ttd_dr.refinement.evaluator import LLMEvaluator
-from ttd_dr.refinement.self_evolution import SelfEvolution
-from ttd_dr.tools.tools import web_search_tool
-from ttd_dr.retrieval.retriever import ChromaRetriever
+from ttd_dr.refinement.self_evolution import DEFAULT_CHECKPOINT_DIR, SelfEvolution
+from ttd_dr.tools.tools import SEARCH_CACHE_TTL, web_search_tool
+from ttd_dr.retrieval.retriever import ChromaRetriever, FAISSRetriever, load_retriever
+from ttd_dr.utils.cache import ResponseCache
+from ttd_dr.utils.http import http_async_client, http_client, make_chat_model
+from ttd_dr.utils.tokens import truncate_tokens
+
+# Process-wide LLM cache: identical message sequences (e.g. a denoise with unchanged
+# history, or repeated evaluator prompts) are answered locally instead of over the wire.
+# Only attached to deterministic (temperature 0) models.
+_LLM_CACHE = InMemoryCache(maxsize=1024)
+
+# Embeddings share the chat models' pooled connections (see make_chat_model).
+_HTTP_CLIENTS = {"http_client": http_client, "http_async_client": http_async_client}
+
+# Answers are synthesized from news search results, so they expire with the search cache.
+ANSWER_CACHE_TTL = SEARCH_CACHE_TTL
+
+# Near-duplicate question guard: same content-word fingerprint, or embedding cosine above threshold.
+DUPLICATE_QUESTION_THRESHOLD = 0.88
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("a an and are at by do does for from how in is it of on or s the this to what whats which with".split())
+
+
+def _question_fingerprint(question: str) -> str:
+    """Order-insensitive fingerprint of a question's content words."""
+    return " ".join(sorted({w for w in _WORD_RE.findall(question.lower()) if w not in _STOPWORDS}))
+
+
+WEB_TOKEN_BUDGET = 800
+
+
+def _format_web_results(web_results: Any, max_tokens: int = WEB_TOKEN_BUDGET) -> str:
+    """Render search hits as title/url/content blocks instead of a dict repr, capped by tokens."""
+    results = web_results.get("results") if isinstance(web_results, dict) else web_results
+    if not isinstance(results, list):
+        return truncate_tokens(str(web_results), max_tokens)
+    text = "\n\n".join(f"[{r.get('title', '')}] ({r.get('url', '')})\n{r.get('content', '')}" for r in results[:5] if isinstance(r, dict))
+    return truncate_tokens(text, max_tokens) if text else "N/A"
+
+
+async def _fetch_sources(question: str, retriever: Optional[Union[ChromaRetriever, FAISSRetriever]], top_k: int = 2) -> Tuple[Any, str]:
+    """Run web search and KB retrieval concurrently; KB failures degrade to empty context."""
+    async def retrieve_kb() -> str:
+        if not retriever:
+            return ""
+        try:
+            kb_docs = await asyncio.to_thread(retriever.retrieve, question, top_k)
+        except Exception:
+            return ""
+        return "\n\n".join([f"[{d['metadata']['name']}]\n{d['preview']}" for d in kb_docs])
+    
+    return await asyncio.gather(web_search_tool.ainvoke({"query": question}), retrieve_kb())
 
 
 class TTDDRAgent:
@@ -29,23 +85,44 @@ class TTDDRAgent:
         temperature: float = 0.0,
         max_search_steps: int = 20,
         use_self_evolution: bool = True,
-        use_diffusion: bool = True
+        use_diffusion: bool = True,
+        use_cache: bool = True
     ):
-        self.model = ChatOpenAI(model=model_name, temperature=temperature, openai_api_key=os.getenv("OPENAI_API_KEY"))
-        self.planner = ResearchPlanner(self.model)
+        self.model = make_chat_model(
+            model_name,
+            temperature,
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            cache=_LLM_CACHE if temperature == 0 else None
+        )
+        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small", **_HTTP_CLIENTS)
+        self.cache = ResponseCache(embeddings=self.embeddings) if use_cache else None
+        self.planner = ResearchPlanner(self.model, self.cache)
         self.evaluator = LLMEvaluator(self.model)
-        self.self_evolution = SelfEvolution(self.model, self.evaluator)
+        self.self_evolution = SelfEvolution(self.model, self.evaluator, self.embeddings, DEFAULT_CHECKPOINT_DIR if use_cache else None)
         self.max_search_steps = max_search_steps
         self.use_self_evolution = use_self_evolution
         self.use_diffusion = use_diffusion
+        self._static_prefix = ""
         
         try:
-            self.retriever = ChromaRetriever()
+            self.retriever = load_retriever()
+            self.retriever.warmup()
         except FileNotFoundError:
             self.retriever = None
     
     def run(self, address: str, brief: str = "") -> AgentState:
         """Execute TTD-DR pipeline: plan → draft → iterate → finalize."""
+        return asyncio.run(self.arun(address, brief))
+    
+    async def arun(self, address: str, brief: str = "") -> AgentState:
+        """Async TTD-DR pipeline; LLM calls within a step overlap where independent."""
+        state = await self.aresearch(address, brief)
+        async for _ in self.astream_final_report(state):
+            pass
+        return state
+    
+    async def aresearch(self, address: str, brief: str = "") -> AgentState:
+        """Run plan → draft → iterate, leaving the final report to astream_final_report."""
         state = AgentState(query=address, brief=brief)
         
         print(f"\n🎯 Starting TTD-DR for: {address}")
@@ -53,130 +130,215 @@ class TTDDRAgent:
             print(f"📋 Brief: {brief}")
         
         state.plan = self.planner.generate_plan(address, brief)
+        state.plan_formatted = self._format_plan(state.plan)
         print(f"\n📝 Generated {len(state.plan.get('sections', []))} research sections")
         
+        self._static_prefix = self._build_static_prefix(state)
+        
         if self.use_diffusion:
             state.draft_report = self._generate_initial_draft(state)
             print(f"\n✍️  Initial draft: {len(state.draft_report)} chars")
         
-        self._iterative_search_and_refine(state)
-        state.final_report = self._generate_final_report(state)
-        print(f"\n✅ Final report: {len(state.final_report)} chars")
-        
+        await self._iterative_search_and_refine(state)
         return state
     
+    async def astream_final_report(self, state: AgentState) -> AsyncIterator[str]:
+        """Stream the final report chunk by chunk; state.final_report is set once it completes."""
+        chunks = []
+        async for chunk in self._generate_final_report(state):
+            chunks.append(chunk)
+            yield chunk
+        state.final_report = "".join(chunks)
+        print(f"\n✅ Final report: {len(state.final_report)} chars")
+    
     def _generate_initial_draft(self, state: AgentState) -> str:
         """Generate initial draft from LLM's internal knowledge (diffusion start)."""
         prompt = ChatPromptTemplate.from_messages([
             ("system", "Generate an initial draft feasibility study. Use internal knowledge plus knowledge base to create a preliminary structure that will be refined through research."),
-            ("user", "Address: {address}\nBrief: {brief}\nPlan:\n{plan}\n\nGenerate initial draft.")
+            ("user", "{context}"),
+            ("user", "Generate initial draft.")
         ])
         
-        response = (prompt | self.model).invoke({
-            "address": state.query,
-            "brief": state.brief or "General feasibility assessment",
-            "plan": self._format_plan(state.plan)
-        })
+        response = (prompt | self.model).invoke({"context": self._static_prefix})
         return response.content
     
-    def _iterative_search_and_refine(self, state: AgentState):
-        """Iterative search with self-evolution and denoising."""
+    async def _iterative_search_and_refine(self, state: AgentState):
+        """Iterative search with self-evolution and denoising.
+        
+        The denoise of step N and the question generation for step N+1 only depend on
+        state committed at the end of step N, so both calls are issued concurrently.
+        The denoise is only awaited once step N+1 has its answer, so it also overlaps
+        with the next search.
+        """
         print(f"\n🔍 Iterative search (max {self.max_search_steps} steps)")
         
+        question_vectors: Dict[str, np.ndarray] = {}
+        question = await self._next_question(state, question_vectors) if self.max_search_steps > 0 else ""
+        denoise = None
         for step in range(self.max_search_steps):
             print(f"\n  Step {step + 1}/{self.max_search_steps}")
             
-            question = self._generate_search_question(state)
             if not question or question == "DONE":
                 print("  ✓ Research complete")
                 break
             
             print(f"  Q: {question[:80]}...")
-            answer = self._search_and_answer(question, state)
+            answer = await self._search_and_answer(question, state, question_vectors)
             
             if self.use_self_evolution and step % 3 == 0:
                 print("  🧬 Self-evolution")
-                answer = self.self_evolution.evolve_answer(question, answer, num_variants=2)
+                answer = await self.self_evolution.aevolve_answer(question, answer, num_variants=2)
+            
+            if denoise is not None:
+                state.update_draft(await denoise)
+                print(f"  📝 Denoised (revision {state.revision_count})")
             
             state.add_search_result(question, answer)
             print(f"  A: {answer[:80]}...")
             
-            if self.use_diffusion:
-                state.update_draft(self._denoise_draft(state))
-                print(f"  📝 Denoised (revision {state.revision_count})")
+            denoise = asyncio.create_task(self._denoise_draft(state)) if self.use_diffusion else None
+            if step < self.max_search_steps - 1:
+                question = await self._next_question(state, question_vectors)
+        
+        if denoise is not None:
+            state.update_draft(await denoise)
+            print(f"  📝 Denoised (revision {state.revision_count})")
         
         print(f"\n✅ Completed {len(state.search_history)} iterations")
     
-    def _generate_search_question(self, state: AgentState) -> str:
+    async def _next_question(self, state: AgentState, question_vectors: Dict[str, np.ndarray]) -> str:
+        """Generate the next question, re-prompting once if it repeats an earlier one.
+        
+        A question that still duplicates history after the re-prompt ends the research
+        loop instead of spending a web search and synthesis call on known ground.
+        """
+        question = await self._generate_search_question(state)
+        if question in ("", "DONE") or not await self._is_duplicate_question(question, state, question_vectors):
+            return question
+        
+        print(f"  ↺ Skipping repeated question: {question[:80]}")
+        question = await self._generate_search_question(state, avoid=[r.question for r in state.search_history])
+        if question in ("", "DONE") or not await self._is_duplicate_question(question, state, question_vectors):
+            return question
+        return "DONE"
+    
+    async def _is_duplicate_question(self, question: str, state: AgentState, question_vectors: Dict[str, np.ndarray]) -> bool:
+        """Check question against history by fingerprint, then by embedding similarity."""
+        if not state.search_history:
+            return False
+        fingerprint = _question_fingerprint(question)
+        if any(_question_fingerprint(r.question) == fingerprint for r in state.search_history):
+            return True
+        
+        try:
+            missing = [q for q in [question] + [r.question for r in state.search_history] if q not in question_vectors]
+            for q, vector in zip(missing, await self.embeddings.aembed_documents(missing)):
+                vector = np.asarray(vector, dtype=np.float32)
+                question_vectors[q] = vector / (np.linalg.norm(vector) or 1.0)
+        except Exception:
+            return False
+        
+        history = np.stack([question_vectors[r.question] for r in state.search_history])
+        return float(np.max(history @ question_vectors[question])) > DUPLICATE_QUESTION_THRESHOLD
+    
+    async def _generate_search_question(self, state: AgentState, avoid: Optional[List[str]] = None) -> str:
         """Generate next focused search question."""
         prompt = ChatPromptTemplate.from_messages([
             ("system", "Generate the next specific search question for the feasibility study. Consider the plan, previous questions, and current gaps. Return a focused question or 'DONE' if complete."),
-            ("user", "Address: {address}\nPlan:\n{plan}\nPrevious:\n{previous}\nDraft:\n{draft}\n\nNext question:")
+            ("user", "{context}"),
+            ("user", "Previous:\n{previous}\nDraft:\n{draft}\n\nNext question:")
         ])
         
-        previous = "\n".join([f"{i+1}. {r.question}" for i, r in enumerate(state.search_history[-5:])]) or "None"
+        previous = "\n".join([f"{i+1}. {r.question}" for i, r in enumerate(state.recent_results(5))]) or "None"
+        if avoid:
+            previous += "\n\nAlready covered, ask about a different topic:\n" + "\n".join(f"- {q}" for q in avoid)
+        draft = state.draft_report[:500] if state.draft_report else "No draft"
+        
+        cache_key = f"{self._static_prefix}\n{previous}\n{draft}"
+        if self.cache and (cached := self.cache.get("question", cache_key)) is not None:
+            return cached
         
-        response = (prompt | self.model).invoke({
-            "address": state.query,
-            "plan": self._format_plan(state.plan),
+        response = await (prompt | self.model).ainvoke({
+            "context": self._static_prefix,
             "previous": previous,
-            "draft": state.draft_report[:500] if state.draft_report else "No draft"
+            "draft": draft
         })
-        return response.content.strip()
+        question = response.content.strip()
+        if self.cache:
+            self.cache.put("question", cache_key, question)
+        return question
     
-    def _search_and_answer(self, question: str, state: AgentState) -> str:
-        """Search and synthesize answer using web and knowledge base."""
-        web_results = web_search_tool.invoke({"query": question})
+    async def _search_and_answer(self, question: str, state: AgentState, question_vectors: Optional[Dict[str, np.ndarray]] = None) -> str:
+        """Search and synthesize answer using web and knowledge base.
+        
+        The question's embedding is shared with the duplicate check via `question_vectors`, so it is embedded once.
+        """
+        namespace = f"answer:{self._static_prefix}"
+        vector = None
+        if self.cache:
+            question_vectors = {} if question_vectors is None else question_vectors
+            vector = question_vectors.get(question)
+            if vector is None and (vector := await asyncio.to_thread(self.cache.embed, question)) is not None:
+                question_vectors[question] = vector
+            if (cached := await asyncio.to_thread(self.cache.get, namespace, question, True, ANSWER_CACHE_TTL, vector)) is not None:
+                return cached
         
-        kb_results = ""
-        if self.retriever:
-            try:
-                kb_docs = self.retriever.retrieve(question, top_k=2)
-                kb_results = "\n\n".join([f"[{d['metadata']['name']}]\n{d['content'][:300]}" for d in kb_docs])
-            except:
-                pass
+        web_results, kb_results = await _fetch_sources(question, self.retriever)
         
         prompt = ChatPromptTemplate.from_messages([
             ("system", "Synthesize a comprehensive answer from search results. Focus on property feasibility facts."),
+            ("user", "{context}"),
             ("user", "Question: {question}\n\nWeb:\n{web}\n\nKB:\n{kb}\n\nAnswer:")
         ])
         
-        response = (prompt | self.model).invoke({
+        response = await (prompt | self.model).ainvoke({
+            "context": self._static_prefix,
             "question": question,
-            "web": str(web_results)[:2000],
+            "web": _format_web_results(web_results),
             "kb": kb_results[:1000] if kb_results else "N/A"
         })
+        if self.cache:
+            await asyncio.to_thread(self.cache.put, namespace, question, response.content, True, vector)
         return response.content
     
-    def _denoise_draft(self, state: AgentState) -> str:
+    async def _denoise_draft(self, state: AgentState) -> str:
         """Refine draft by incorporating latest research findings."""
-        latest = state.search_history[-3:] if state.search_history else []
-        latest_text = "\n\n".join([f"Q: {r.question}\nA: {r.answer}" for r in latest])
-        
         prompt = ChatPromptTemplate.from_messages([
             ("system", "Refine the draft by incorporating new research. Update facts, verify information, add details."),
+            ("user", "{context}"),
             ("user", "Draft:\n{draft}\n\nLatest:\n{latest}\n\nRefine:")
         ])
         
-        response = (prompt | self.model).invoke({"draft": state.draft_report, "latest": latest_text})
+        response = await (prompt | self.model).ainvoke({"context": self._static_prefix, "draft": state.draft_report, "latest": state.latest_three_text})
         return response.content
     
-    def _generate_final_report(self, state: AgentState) -> str:
-        """Generate final comprehensive report with all research findings."""
-        research_text = "\n\n".join([f"Q: {r.question}\nA: {r.answer}" for r in state.search_history])
+    async def _generate_final_report(self, state: AgentState) -> AsyncIterator[str]:
+        """Stream final comprehensive report with all research findings."""
+        research = io.StringIO()
+        research.writelines(f"Q: {r.question}\nA: {r.answer}\n\n" for r in state.search_history)
         
         prompt = ChatPromptTemplate.from_messages([
             ("system", "Generate a comprehensive investor-grade feasibility study. Structure: Executive Summary, Site Context, Zoning, Environmental, Infrastructure, Market, Opportunities, Risks, Recommendations. Use professional language and cite sources."),
-            ("user", "Address: {address}\nBrief: {brief}\nResearch:\n{research}\nDraft:\n{draft}\n\nGenerate final report:")
+            ("user", "{context}"),
+            ("user", "Research:\n{research}\nDraft:\n{draft}\n\nGenerate final report:")
         ])
         
-        response = (prompt | self.model).invoke({
-            "address": state.query,
-            "brief": state.brief or "General feasibility assessment",
-            "research": research_text,
+        async for chunk in (prompt | self.model).astream({
+            "context": self._static_prefix,
+            "research": research.getvalue(),
             "draft": state.draft_report if self.use_diffusion else ""
-        })
-        return response.content
+        }):
+            if chunk.content:
+                yield chunk.content
+    
+    def _build_static_prefix(self, state: AgentState) -> str:
+        """Build the run-invariant context shared verbatim by every prompt.
+        
+        Keeping it byte-identical and ahead of the volatile fields lets the provider's
+        prompt cache reuse the prefix across all calls in a run.
+        """
+        brief = state.brief or "General feasibility assessment"
+        return f"Address: {state.query}\nBrief: {brief}\nPlan:\n{state.plan_formatted}"
     
     def _format_plan(self, plan: dict) -> str:
         """Format plan for display."""
@@ -206,6 +368,7 @@ class TTDDRGraphState(TypedDict):
     brief: str
     plan: Dict[str, Any]
     search_history: list
+    question: str
     draft_report: str
     final_report: str
     step_count: int
@@ -213,19 +376,31 @@ class TTDDRGraphState(TypedDict):
 
 _model, _planner, _evaluator, _self_evolution, _retriever = None, None, None, None, None
 
+# Search iterations for the graph; kept small for fast LangGraph Studio runs.
+MAX_GRAPH_STEPS = 2
+
+# Prompt context budgets for graph nodes, in gpt-4o-mini tokens.
+DRAFT_TOKEN_BUDGET = 400
+RESEARCH_TOKEN_BUDGET = 800
+GRAPH_WEB_TOKEN_BUDGET = 400
+
+# Resumable self-evolution checkpoints for the graph; set TTD_DR_EVOLVE_CHECKPOINTS=0 to disable.
+GRAPH_EVOLVE_CHECKPOINTS = os.getenv("TTD_DR_EVOLVE_CHECKPOINTS", "1") != "0"
+
 
 def _get_components():
     """Lazy initialization of components."""
     global _model, _planner, _evaluator, _self_evolution, _retriever
     
     if _model is None:
-        _model = ChatOpenAI(model="gpt-4o-mini", temperature=0, openai_api_key=os.getenv("OPENAI_API_KEY"))
-        _planner = ResearchPlanner(_model)
+        _model = make_chat_model("gpt-4o-mini", 0, openai_api_key=os.getenv("OPENAI_API_KEY"), cache=_LLM_CACHE)
+        embeddings = OpenAIEmbeddings(model="text-embedding-3-small", **_HTTP_CLIENTS)
+        _planner = ResearchPlanner(_model, ResponseCache(embeddings=embeddings))
         _evaluator = LLMEvaluator(_model)
-        _self_evolution = SelfEvolution(_model, _evaluator)
+        _self_evolution = SelfEvolution(_model, _evaluator, embeddings, DEFAULT_CHECKPOINT_DIR if GRAPH_EVOLVE_CHECKPOINTS else None)
         
         try:
-            _retriever = ChromaRetriever()
+            _retriever = load_retriever()
         except FileNotFoundError:
             _retriever = None
     
@@ -287,35 +462,56 @@ def stage2_draft_node(state: TTDDRGraphState) -> dict:
     }
 
 
-def search_node(state: TTDDRGraphState) -> dict:
-    """Perform iterative search with self-evolution."""
-    model, _, _, self_evolution, retriever = _get_components()
+async def _generate_graph_question(state: TTDDRGraphState, model: ChatOpenAI) -> str:
+    """Generate the next search question, or "" once research is complete."""
     step = state["step_count"]
+    if step >= MAX_GRAPH_STEPS:
+        return ""
     
-    # Generate question
     prompt = ChatPromptTemplate.from_messages([
         ("system", "Generate the next specific search question for feasibility study. Consider plan, previous questions, and knowledge gaps. Return focused question or 'DONE'."),
-        ("user", "Address: {address}\nStep: {step}/2\nPlan:\n{plan}\nPrevious:\n{history}\n\nNext question:")
+        ("user", "Address: {address}\nStep: {step}/{max_steps}\nPlan:\n{plan}\nPrevious:\n{history}\n\nNext question:")
     ])
     
     history = "\n".join([f"{i+1}. {q}" for i, (q, _) in enumerate(state["search_history"][-3:])]) if state["search_history"] else "None"
     plan_text = "\n".join([f"• {s.get('title', 'Section')}" for s in state["plan"].get("sections", [])])
     
-    response = (prompt | model).invoke({"address": state["address"], "step": step + 1, "plan": plan_text, "history": history})
+    response = await (prompt | model).ainvoke({"address": state["address"], "step": step + 1, "max_steps": MAX_GRAPH_STEPS, "plan": plan_text, "history": history})
     question = response.content.strip()
+    return "" if "DONE" in question.upper() else question
+
+
+async def _denoise_graph_draft(state: TTDDRGraphState, model: ChatOpenAI) -> str:
+    """Refine the draft with the latest research (diffusion denoising)."""
+    latest = state["search_history"][-2:]
+    latest_text = "\n\n".join([f"Q: {q}\nA: {a}" for q, a in latest])
     
-    if "DONE" in question.upper() or step >= 2:
-        return {"messages": [AIMessage(content="✓ Research complete")]}
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "Refine draft through diffusion denoising. Incorporate research, update facts, verify consistency, maintain structure, improve clarity."),
+        ("user", "Draft:\n{draft}\n\nResearch:\n{research}\n\nRefine:")
+    ])
+    
+    response = await (prompt | model).ainvoke({"draft": truncate_tokens(state["draft_report"], DRAFT_TOKEN_BUDGET), "research": latest_text})
+    return response.content
+
+
+async def gen_question_node(state: TTDDRGraphState) -> dict:
+    """Generate the first search question."""
+    model, _, _, _, _ = _get_components()
+    question = await _generate_graph_question(state, model)
+    if not question:
+        return {"question": "", "messages": [AIMessage(content="✓ Research complete")]}
+    return {"question": question}
+
+
+async def answer_node(state: TTDDRGraphState) -> dict:
+    """Answer the pending question from web + KB, with self-evolution."""
+    model, _, _, self_evolution, retriever = _get_components()
+    step = state["step_count"]
+    question = state["question"]
     
     # Search
-    web_results = web_search_tool.invoke({"query": question})
-    kb_results = ""
-    if retriever:
-        try:
-            kb_docs = retriever.retrieve(question, top_k=2)
-            kb_results = "\n\n".join([f"[{d['metadata']['name']}]\n{d['content'][:300]}" for d in kb_docs])
-        except:
-            pass
+    web_results, kb_results = await _fetch_sources(question, retriever)
     
     # Synthesize answer
     answer_prompt = ChatPromptTemplate.from_messages([
@@ -323,17 +519,17 @@ def search_node(state: TTDDRGraphState) -> dict:
         ("user", "Question: {q}\nWeb:\n{web}\nKB:\n{kb}\n\nAnswer:")
     ])
     
-    answer = (answer_prompt | model).invoke({
+    answer = (await (answer_prompt | model).ainvoke({
         "q": question,
-        "web": str(web_results)[:1500],
+        "web": _format_web_results(web_results, GRAPH_WEB_TOKEN_BUDGET),
         "kb": kb_results[:500] if kb_results else "N/A"
-    }).content
+    })).content
     
     # Self-evolution
     messages_update = [AIMessage(content=f"🔍 Step {step+1}: {question[:80]}...")]
     if step % 2 == 0 and step > 0:
         messages_update.append(AIMessage(content="🧬 Self-evolution"))
-        answer = self_evolution.evolve_answer(question, answer, num_variants=2, num_iterations=1)
+        answer = await self_evolution.aevolve_answer(question, answer, num_variants=2, num_iterations=1)
     
     return {
         "search_history": state["search_history"] + [(question, answer)],
@@ -342,50 +538,47 @@ def search_node(state: TTDDRGraphState) -> dict:
     }
 
 
-def denoise_node(state: TTDDRGraphState) -> dict:
-    """Denoise draft with new research (diffusion denoising)."""
-    model, _, _, _, _ = _get_components()
+async def parallel_refine_node(state: TTDDRGraphState) -> dict:
+    """Denoise the draft and generate the next question concurrently.
     
-    if not state["search_history"]:
-        return {"messages": [AIMessage(content="⚠️ No research")]}
-    
-    latest = state["search_history"][-2:] if len(state["search_history"]) >= 2 else state["search_history"]
-    latest_text = "\n\n".join([f"Q: {q}\nA: {a}" for q, a in latest])
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "Refine draft through diffusion denoising. Incorporate research, update facts, verify consistency, maintain structure, improve clarity."),
-        ("user", "Draft:\n{draft}\n\nResearch:\n{research}\n\nRefine:")
-    ])
+    Both only depend on the search history committed by answer_node, so the two LLM
+    calls overlap instead of running as separate sequential graph steps.
+    """
+    model, _, _, _, _ = _get_components()
+    draft, question = await asyncio.gather(_denoise_graph_draft(state, model), _generate_graph_question(state, model))
     
-    response = (prompt | model).invoke({"draft": state["draft_report"][:1500], "research": latest_text})
+    messages_update = [AIMessage(content=f"📝 Denoised (revision {state['step_count']})")]
+    if not question:
+        messages_update.append(AIMessage(content="✓ Research complete"))
     
-    return {
-        "draft_report": response.content,
-        "messages": [AIMessage(content=f"📝 Denoised (revision {state['step_count']})")]
-    }
+    return {"draft_report": draft, "question": question, "messages": messages_update}
 
 
-def final_report_node(state: TTDDRGraphState) -> dict:
-    """Generate final comprehensive report."""
+async def final_report_node(state: TTDDRGraphState) -> dict:
+    """Generate final comprehensive report, streamed so LangGraph can surface tokens as they arrive."""
     model, _, _, _, _ = _get_components()
     
-    research_text = "\n\n".join([f"Q: {q}\nA: {a}" for q, a in state["search_history"]])
+    research = io.StringIO()
+    research.writelines(f"Q: {q}\nA: {a}\n\n" for q, a in state["search_history"])
     
     prompt = ChatPromptTemplate.from_messages([
         ("system", "Generate comprehensive investor-grade feasibility study. Structure: Executive Summary, Site Context, Zoning, Environmental, Infrastructure, Market, Opportunities, Risks, Recommendations. Use professional language, cite sources, be thorough."),
         ("user", "Address: {address}\nBrief: {brief}\nResearch:\n{research}\nDraft:\n{draft}\n\nGenerate final report:")
     ])
     
-    response = (prompt | model).invoke({
+    chunks = []
+    async for chunk in (prompt | model).astream({
         "address": state["address"],
         "brief": state.get("brief", "General feasibility assessment"),
-        "research": research_text[:3000],
-        "draft": state["draft_report"][:1500]
-    })
+        "research": truncate_tokens(research.getvalue(), RESEARCH_TOKEN_BUDGET),
+        "draft": truncate_tokens(state["draft_report"], DRAFT_TOKEN_BUDGET)
+    }):
+        chunks.append(chunk.content)
+    report = "".join(chunks)
     
     return {
-        "final_report": response.content,
-        "messages": [AIMessage(content=f"✅ Final report: {len(response.content)} chars\n\n{response.content[:500]}...")]
+        "final_report": report,
+        "messages": [AIMessage(content=f"✅ Final report: {len(report)} chars\n\n{report[:500]}...")]
     }
 
 
@@ -393,16 +586,14 @@ def final_report_node(state: TTDDRGraphState) -> dict:
 # Routing Logic
 # ============================================================================
 
-def should_continue_search(state: TTDDRGraphState) -> Literal["denoise", "final_report"]:
-    """Decide whether to continue search or finalize."""
-    if state["step_count"] >= 2 or (state["messages"] and "complete" in state["messages"][-1].content.lower()):
-        return "final_report"
-    return "denoise"
+def after_question_routing(state: TTDDRGraphState) -> Literal["answer", "final_report"]:
+    """Answer the pending question, or finalize once the generator reports DONE."""
+    return "answer" if state.get("question") else "final_report"
 
 
-def after_denoise_routing(state: TTDDRGraphState) -> Literal["search", "final_report"]:
-    """Decide whether to search more or finalize."""
-    return "final_report" if state["step_count"] >= 2 else "search"
+def after_answer_routing(state: TTDDRGraphState) -> Literal["parallel_refine", "final_report"]:
+    """Decide whether to refine and search more or finalize."""
+    return "final_report" if state["step_count"] >= MAX_GRAPH_STEPS else "parallel_refine"
 
 
 # ============================================================================
@@ -412,24 +603,27 @@ def after_denoise_routing(state: TTDDRGraphState) -> Literal["search", "final_re
 def create_graph():
     """Create TTD-DR agent graph.
     
-    Flow: START → parse → plan → draft → search → denoise → (loop or finalize) → END
+    Flow: START → parse → plan → draft → gen_question → answer → parallel_refine
+    (denoise ∥ next question) → answer → ... → final_report → END
     """
     workflow = StateGraph(TTDDRGraphState)
     
     workflow.add_node("parse_input", parse_input_node)
     workflow.add_node("stage1_plan", stage1_plan_node)
     workflow.add_node("stage2_draft", stage2_draft_node)
-    workflow.add_node("search", search_node)
-    workflow.add_node("denoise", denoise_node)
+    workflow.add_node("gen_question", gen_question_node)
+    workflow.add_node("answer", answer_node)
+    workflow.add_node("parallel_refine", parallel_refine_node)
     workflow.add_node("final_report", final_report_node)
     
     workflow.add_edge(START, "parse_input")
     workflow.add_edge("parse_input", "stage1_plan")
     workflow.add_edge("stage1_plan", "stage2_draft")
-    workflow.add_edge("stage2_draft", "search")
+    workflow.add_edge("stage2_draft", "gen_question")
     
-    workflow.add_conditional_edges("search", should_continue_search, {"denoise": "denoise", "final_report": "final_report"})
-    workflow.add_conditional_edges("denoise", after_denoise_routing, {"search": "search", "final_report": "final_report"})
+    workflow.add_conditional_edges("gen_question", after_question_routing, {"answer": "answer", "final_report": "final_report"})
+    workflow.add_conditional_edges("answer", after_answer_routing, {"parallel_refine": "parallel_refine", "final_report": "final_report"})
+    workflow.add_conditional_edges("parallel_refine", after_question_routing, {"answer": "answer", "final_report": "final_report"})
     
     workflow.add_edge("final_report", END)
     
@@ -1,11 +1,13 @@
 """Agent State Management - Tracks research progress."""
 
-from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from collections import deque
+from dataclasses import asdict, dataclass, field, fields
+from itertools import islice
+from typing import Deque, List, Dict, Any
 from datetime import datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchResult:
     """Single search question-answer pair."""
     question: str
@@ -15,26 +17,37 @@ class SearchResult:
     score: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentState:
     """Research agent state."""
     query: str
     brief: str = ""
     plan: Dict[str, Any] = field(default_factory=dict)
-    search_history: List[SearchResult] = field(default_factory=list)
+    plan_formatted: str = ""
+    search_history: Deque[SearchResult] = field(default_factory=deque)
+    latest_three_text: str = ""
     draft_report: str = ""
     revision_count: int = 0
     final_report: str = ""
     metadata: Dict[str, Any] = field(default_factory=dict)
+    _recent_context_cache: Dict[int, str] = field(default_factory=dict, init=False, repr=False, compare=False)
     
     def add_search_result(self, question: str, answer: str, sources: List[str] = None):
-        """Add search result to history."""
+        """Add search result to history and refresh the cached recent views."""
         self.search_history.append(SearchResult(question=question, answer=answer, sources=sources or []))
+        self._recent_context_cache.clear()
+        self.latest_three_text = "\n\n".join([f"Q: {r.question}\nA: {r.answer}" for r in self.recent_results(3)])
+    
+    def recent_results(self, n: int) -> List[SearchResult]:
+        """Last n search results in chronological order, without copying the whole history."""
+        return list(islice(reversed(self.search_history), n))[::-1]
     
     def get_search_context(self, last_n: int = 5) -> str:
-        """Get formatted recent search history."""
-        recent = self.search_history[-last_n:] if last_n > 0 else self.search_history
-        return "\n\n".join([f"Q{i}: {r.question}\nA{i}: {r.answer}" for i, r in enumerate(recent, 1)])
+        """Get formatted recent search history (cached until the next result is added)."""
+        if last_n not in self._recent_context_cache:
+            recent = self.recent_results(last_n) if last_n > 0 else self.search_history
+            self._recent_context_cache[last_n] = "\n\n".join([f"Q{i}: {r.question}\nA{i}: {r.answer}" for i, r in enumerate(recent, 1)])
+        return self._recent_context_cache[last_n]
     
     def update_draft(self, new_draft: str):
         """Update draft and increment revision count."""
@@ -42,15 +55,8 @@ class AgentState:
         self.revision_count += 1
     
     def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary for serialization."""
-        return {
-            "query": self.query,
-            "brief": self.brief,
-            "plan": self.plan,
-            "search_history": [{"question": r.question, "answer": r.answer, "sources": r.sources, "timestamp": r.timestamp} for r in self.search_history],
-            "draft_report": self.draft_report,
-            "revision_count": self.revision_count,
-            "final_report": self.final_report,
-            "metadata": self.metadata
-        }
+        """Convert to a JSON-ready dictionary (history as a list, derived caches omitted)."""
+        data = {f.name: getattr(self, f.name) for f in fields(self) if f.name not in ("search_history", "latest_three_text", "_recent_context_cache")}
+        data["search_history"] = [asdict(r) for r in self.search_history]
+        return data
 
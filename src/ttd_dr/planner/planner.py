@@ -1,32 +1,44 @@
 """Research Planner - Generates structured feasibility study plans."""
 
-import json
-from typing import Dict, Any
+import re
+from typing import Dict, Any, Optional
+
+import orjson
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
+from ..utils.cache import ResponseCache
+
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
 
 
 class ResearchPlanner:
     """Generates structured research plans for property feasibility studies."""
     
-    def __init__(self, model: ChatOpenAI):
+    def __init__(self, model: ChatOpenAI, cache: Optional[ResponseCache] = None):
         self.model = model
+        self.cache = cache
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", "Expert real estate analyst. Generate comprehensive research plan covering: Site Context, Zoning, Environmental, Infrastructure, Market, Opportunities, Risks. Output JSON with 'sections' array containing objects with 'title' and 'questions' fields."),
             ("user", "{query}")
         ])
+        self.chain = self.prompt | self.model.bind(response_format={"type": "json_object"})
     
     def generate_plan(self, query: str, brief: str = "") -> Dict[str, Any]:
         """Generate research plan for feasibility study."""
         full_query = f"Address: {query}" + (f"\nBrief: {brief}" if brief else "")
-        response = (self.prompt | self.model).invoke({"query": full_query})
+        # Scoped per address so only the brief is matched fuzzily: nearby addresses embed almost identically.
+        namespace = f"plan:{query}"
+        content = self.cache.get(namespace, full_query, fuzzy=True) if self.cache else None
+        if content is None:
+            content = self.chain.invoke({"query": full_query}).content
+            if self.cache:
+                self.cache.put(namespace, full_query, content, fuzzy=True)
         
         try:
-            return json.loads(response.content)
-        except json.JSONDecodeError:
-            content = response.content
-            start, end = content.find('{'), content.rfind('}') + 1
-            if start != -1 and end > start:
-                return json.loads(content[start:end])
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            match = _JSON_OBJECT_RE.search(content)
+            if match:
+                return orjson.loads(match.group(0))
             return {"sections": [{"title": "General Research", "questions": [query]}]}
 
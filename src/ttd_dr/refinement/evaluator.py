@@ -1,9 +1,14 @@
 """LLM-as-Judge Evaluator for quality assessment."""
 
+import asyncio
 import re
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
+from ..utils.parsing import extract_json_array
+
+_SCORE_RE = re.compile(r'Score:\s*(\d+(?:\.\d+)?)', re.IGNORECASE)
+_FEEDBACK_RE = re.compile(r'Feedback:\s*(.+)', re.IGNORECASE | re.DOTALL)
 
 
 class LLMEvaluator:
@@ -11,17 +16,34 @@ class LLMEvaluator:
     
     def __init__(self, model: ChatOpenAI):
         self.model = model
+        self.answer_chain = ChatPromptTemplate.from_messages([
+            ("system", "Expert evaluator. Rate answer on: Helpfulness, Accuracy, Completeness. Format: 'Score: X\nFeedback: ...'"),
+            ("user", "Question: {question}\nAnswer: {answer}")
+        ]) | model
+        self.answers_chain = ChatPromptTemplate.from_messages([
+            ("system", "Expert evaluator. Rate each candidate answer on: Helpfulness, Accuracy, Completeness. Output only a JSON array with one object per candidate, in order: [{{\"score\": 0-10, \"feedback\": \"...\"}}]"),
+            ("user", "Question: {question}\nCandidates:\n{answers}")
+        ]) | model
     
     def evaluate_answer(self, question: str, answer: str) -> Tuple[float, str]:
         """Evaluate answer quality (score 0-10 + feedback)."""
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "Expert evaluator. Rate answer on: Helpfulness, Accuracy, Completeness. Format: 'Score: X\nFeedback: ...'"),
-            ("user", "Question: {question}\nAnswer: {answer}")
-        ])
-        
-        response = (prompt | self.model).invoke({"question": question, "answer": answer})
+        response = self.answer_chain.invoke({"question": question, "answer": answer})
+        return self._extract_score(response.content), self._extract_feedback(response.content)
+    
+    async def aevaluate_answer(self, question: str, answer: str) -> Tuple[float, str]:
+        """Async evaluate_answer."""
+        response = await self.answer_chain.ainvoke({"question": question, "answer": answer})
         return self._extract_score(response.content), self._extract_feedback(response.content)
     
+    async def aevaluate_answers(self, question: str, answers: List[str]) -> List[Tuple[float, str]]:
+        """Evaluate several answers to one question in a single round-trip; the per-answer fallback runs concurrently."""
+        if len(answers) > 1:
+            response = await self.answers_chain.ainvoke(self._answers_input(question, answers))
+            results = self._parse_evaluations(response.content, len(answers))
+            if results is not None:
+                return results
+        return list(await asyncio.gather(*[self.aevaluate_answer(question, a) for a in answers]))
+    
     def evaluate_report(self, query: str, report: str) -> Tuple[float, str]:
         """Evaluate report quality (comprehensiveness, professionalism, actionability)."""
         prompt = ChatPromptTemplate.from_messages([
@@ -32,13 +54,33 @@ class LLMEvaluator:
         response = (prompt | self.model).invoke({"query": query, "report": report})
         return self._extract_score(response.content), self._extract_feedback(response.content)
     
+    def _answers_input(self, question: str, answers: List[str]) -> Dict[str, str]:
+        """Prompt input for the batched evaluation."""
+        answers_text = "\n\n---\n\n".join([f"Candidate {i+1}:\n{a}" for i, a in enumerate(answers)])
+        return {"question": question, "answers": answers_text}
+    
+    def _parse_evaluations(self, content: str, expected: int) -> Optional[List[Tuple[float, str]]]:
+        """Parse the batched JSON evaluation; None if it doesn't match the candidates."""
+        parsed = extract_json_array(content)
+        if parsed is None or len(parsed) != expected or not all(isinstance(p, dict) for p in parsed):
+            return None
+        
+        results = []
+        for p in parsed:
+            try:
+                score = float(p.get("score", 5.0))
+            except (TypeError, ValueError):
+                score = 5.0
+            results.append((score, str(p.get("feedback", ""))))
+        return results
+    
     def _extract_score(self, content: str) -> float:
         """Extract numeric score."""
-        match = re.search(r'Score:\s*(\d+(?:\.\d+)?)', content, re.IGNORECASE)
+        match = _SCORE_RE.search(content)
         return float(match.group(1)) if match else 5.0
     
     def _extract_feedback(self, content: str) -> str:
         """Extract feedback text."""
-        match = re.search(r'Feedback:\s*(.+)', content, re.IGNORECASE | re.DOTALL)
+        match = _FEEDBACK_RE.search(content)
         return match.group(1).strip() if match else content
 
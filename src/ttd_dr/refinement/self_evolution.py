@@ -1,57 +1,365 @@
 """Self-Evolution Algorithm - Component-wise optimization."""
 
-from typing import List
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+import numpy as np
+import orjson
+from langchain_core.embeddings import Embeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 from .evaluator import LLMEvaluator
+from ..utils.parsing import extract_json_array
+
+# Evolved variants this similar (minimum pairwise cosine) are returned as-is instead of merged.
+MERGE_SIMILARITY_THRESHOLD = 0.95
+
+# A first variant scoring at least this is used as-is: no further variants, revisions or merge.
+EARLY_EXIT_SCORE = 9.0
+
+# Scored variants below this are left out of the merge (unless nothing clears it).
+MERGE_SCORE_FLOOR = 5.0
+
+# Revisions sampled per feedback step when fanning out (num_iterations > 1, temperature > 0); each is
+# scored and the best one kept. Otherwise a single revision is drawn, since samples would be identical.
+REVISION_CANDIDATES = 2
+
+DEFAULT_CHECKPOINT_DIR = Path.home() / ".cache" / "ttd_dr" / "evolve"
+
+# Checkpoints only exist to resume a failed evolve: they are deleted once it completes, files left by
+# runs that were never retried expire after CHECKPOINT_TTL seconds, and at most CHECKPOINT_MEMO_SIZE
+# questions' checkpoints are held in memory.
+CHECKPOINT_TTL = 24 * 3600
+CHECKPOINT_MEMO_SIZE = 32
+
+
+# Checkpoint files held by evolves in progress (process-wide), so concurrent runs of one question never share one.
+_ACTIVE_CHECKPOINTS: Set[Path] = set()
+_ACTIVE_LOCK = threading.Lock()
+
+
+def _sha256(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _model_identity(model: Any) -> str:
+    """Class, model name and temperature: what makes a checkpointed output reusable."""
+    name = getattr(model, "model_name", None) or getattr(model, "model", None)
+    return f"{type(model).__name__}:{name if isinstance(name, str) else ''}:{getattr(model, 'temperature', None)}"
 
 
 class SelfEvolution:
     """Implements self-evolution for component optimization."""
     
-    def __init__(self, model: ChatOpenAI, evaluator: LLMEvaluator):
+    def __init__(self, model: ChatOpenAI, evaluator: LLMEvaluator, embeddings: Optional[Embeddings] = None, cache_dir: Optional[Path] = None, k_candidates: int = REVISION_CANDIDATES):
+        """`model` should use pooled HTTP clients (see ttd_dr.utils.http.make_chat_model), since evolve issues many calls per answer.
+        
+        With `k_candidates` > 1, multi-iteration evolves on a sampling (temperature > 0) model draw that many
+        revisions per step in one batch, score them concurrently and keep the best.
+        
+        With `cache_dir`, every step's output is appended to a JSONL checkpoint per question and model (name,
+        temperature; also the evaluator's), so a retry after a failure (e.g. a rate limit) replays completed
+        steps instead of paying for them again. A concurrent evolve of the same question gets its own file, and
+        the checkpoint is removed once the evolve completes.
+        """
         self.model = model
         self.evaluator = evaluator
+        self.embeddings = embeddings
+        self.k_candidates = max(1, k_candidates)
+        self._identity = _model_identity(model) + "|" + _model_identity(getattr(evaluator, "model", None))
+        self._variants_chain = ChatPromptTemplate.from_messages([
+            ("system", "Generate {num_variants} diverse, comprehensive answers, each focusing on different aspects than the initial answer and each other. Output only a JSON array of {num_variants} strings."),
+            ("user", "Question: {question}\nInitial: {initial_answer}")
+        ]) | model
+        self._variant_chain = ChatPromptTemplate.from_messages([
+            ("system", "Generate diverse, comprehensive answer. Focus on different aspects than previous."),
+            ("user", "Question: {question}\nInitial: {initial_answer}")
+        ]) | model
+        self._revise_chain = ChatPromptTemplate.from_messages([
+            ("system", "Improve answer based on feedback."),
+            ("user", "Question: {question}\nAnswer: {answer}\nFeedback: {feedback}\n\nImproved:")
+        ]) | model
+        self._merge_chain = ChatPromptTemplate.from_messages([
+            ("system", "Merge candidate answers into comprehensive answer. Combine best info, reconcile conflicts."),
+            ("user", "Question: {question}\nCandidates:\n{variants}")
+        ]) | model
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._expire_checkpoints()
+        self._checkpoints: "OrderedDict[Path, Dict[str, Any]]" = OrderedDict()
     
     def evolve_answer(self, question: str, initial_answer: str, num_variants: int = 3, num_iterations: int = 1) -> str:
+        """Evolve answer through variants and iterations (sync wrapper around aevolve_answer)."""
+        return asyncio.run(self.aevolve_answer(question, initial_answer, num_variants, num_iterations))
+    
+    async def aevolve_answer(self, question: str, initial_answer: str, num_variants: int = 3, num_iterations: int = 1) -> str:
         """Evolve answer through variants and iterations."""
-        variants = self._generate_variants(question, initial_answer, num_variants)
-        evolved_variants = [self._evolve_variant(question, v, num_iterations) for v in variants]
-        return self._merge_variants(question, evolved_variants)
+        checkpoint = self._claim_checkpoint(question)
+        try:
+            answer, variants = await self._aevolve_candidates(question, initial_answer, num_variants, num_iterations, checkpoint)
+            if answer is None:
+                answer = await self._amerge_variants(question, variants, checkpoint)
+            self._clear_checkpoint(checkpoint)
+        finally:
+            self._release_checkpoint(checkpoint)
+        return answer
     
-    def _generate_variants(self, question: str, initial_answer: str, num_variants: int) -> List[str]:
-        """Generate diverse answer variants."""
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "Generate diverse, comprehensive answer. Focus on different aspects than previous."),
-            ("user", "Question: {question}\nInitial: {initial_answer}")
-        ])
+    def stream_evolve_answer(self, question: str, initial_answer: str, num_variants: int = 3, num_iterations: int = 1) -> Iterator[str]:
+        """Sync counterpart of astream_evolve_answer."""
+        loop = asyncio.new_event_loop()
+        chunks = self.astream_evolve_answer(question, initial_answer, num_variants, num_iterations)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(chunks.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(chunks.aclose())
+            loop.close()
+    
+    async def astream_evolve_answer(self, question: str, initial_answer: str, num_variants: int = 3, num_iterations: int = 1) -> AsyncIterator[str]:
+        """Evolve answer, streaming the final merge token by token (a short-circuited answer is yielded whole)."""
+        checkpoint = self._claim_checkpoint(question)
+        try:
+            answer, variants = await self._aevolve_candidates(question, initial_answer, num_variants, num_iterations, checkpoint)
+            if answer is not None:
+                yield answer
+            else:
+                async for chunk in self._astream_merge(question, variants, checkpoint):
+                    yield chunk
+            self._clear_checkpoint(checkpoint)
+        finally:
+            self._release_checkpoint(checkpoint)
+    
+    async def _aevolve_candidates(self, question: str, initial_answer: str, num_variants: int, num_iterations: int, checkpoint: Optional[Path] = None) -> Tuple[Optional[str], List[str]]:
+        """Everything up to the merge: (final answer if the merge can be skipped, evolved variants).
         
-        return [(prompt | self.model).invoke({"question": question, "initial_answer": initial_answer}).content for _ in range(num_variants)]
+        More variants are only generated if the first scores below EARLY_EXIT_SCORE. That costs a
+        sequential generate/score hop on hard questions in exchange for skipping the rest on easy ones.
+        The remaining num_variants - 1 come from one JSON-array call when at least 2 are needed (e.g. the
+        default num_variants=3); with num_variants=2 the second is a single-variant call.
+        """
+        variants = await self._agenerate_variants(question, initial_answer, 1, checkpoint=checkpoint)
+        evaluations = await self._aevaluate(question, variants, checkpoint)
+        if num_variants > 1 and evaluations[0][0] < EARLY_EXIT_SCORE:
+            more = await self._agenerate_variants(question, initial_answer, num_variants - 1, previous=variants, checkpoint=checkpoint)
+            variants = variants + more
+            evaluations = evaluations + await self._aevaluate(question, more, checkpoint)
+        ranked = await self._aevolve_variants(question, variants, num_iterations, evaluations, checkpoint)
+        evolved_variants = [text for _, text in ranked]
+        if len(evolved_variants) == 1 or await self._anear_identical(evolved_variants):
+            return evolved_variants[0], evolved_variants
+        return None, evolved_variants
     
-    def _evolve_variant(self, question: str, variant: str, num_iterations: int) -> str:
-        """Evolve variant through feedback iterations."""
-        current = variant
+    async def _agenerate_variants(self, question: str, initial_answer: str, num_variants: int, previous: Optional[List[str]] = None, checkpoint: Optional[Path] = None) -> List[str]:
+        """Generate diverse answer variants (distinct from `previous` ones).
+        
+        More than one is requested in a single JSON-array round-trip, falling back to one call per variant.
+        """
+        if previous:
+            initial_answer = initial_answer + "\n\nAlready covered by other variants:\n" + "\n---\n".join(previous)
+        if num_variants > 1:
+            inputs = {"question": question, "initial_answer": initial_answer, "num_variants": num_variants}
+            content = await self._acheckpoint(checkpoint, "variants", inputs, lambda: self._acontent(self._variants_chain, inputs))
+            
+            variants = extract_json_array(content)
+            if variants and len(variants) >= num_variants and all(isinstance(v, str) and v.strip() for v in variants):
+                return variants[:num_variants]
+        
+        async def generate() -> List[str]:
+            inputs = [{"question": question, "initial_answer": initial_answer}] * num_variants
+            return [r.content for r in await self._variant_chain.abatch(inputs, config={"max_concurrency": num_variants})]
+        
+        return await self._acheckpoint(checkpoint, "variants:each", {"initial_answer": initial_answer, "num_variants": num_variants}, generate)
+    
+    async def _aevolve_variants(self, question: str, variants: List[str], num_iterations: int, evaluations: Optional[List[Tuple[float, str]]] = None, checkpoint: Optional[Path] = None) -> List[Tuple[float, str]]:
+        """Evolve variants through feedback iterations, revising every variant that scores under 8 in parallel.
+        
+        `evaluations` of the initial variants, when already known, stand in for the initial scoring. Unscored
+        revisions are rescored in one batched call at the start of the next round. Returns (score, variant)
+        best-first, without variants scoring under MERGE_SCORE_FLOOR; a revision from the last round that was
+        never scored keeps its pre-revision score and is exempt from the floor.
+        """
+        current = list(variants)
+        if evaluations is None:
+            evaluations = await self._aevaluate(question, current, checkpoint)
+        scores = [score for score, _ in evaluations]
+        feedbacks = [feedback for _, feedback in evaluations]
+        k = self.k_candidates if num_iterations > 1 and (getattr(self.model, "temperature", None) or 0) > 0 else 1
+        unscored: List[int] = []
         for _ in range(num_iterations):
-            score, feedback = self.evaluator.evaluate_answer(question, current)
-            if score >= 8.0:
+            if unscored:
+                for i, (score, feedback) in zip(unscored, await self._aevaluate(question, [current[i] for i in unscored], checkpoint)):
+                    scores[i], feedbacks[i] = score, feedback
+                unscored = []
+            to_revise = [i for i, score in enumerate(scores) if score < 8.0]
+            if not to_revise:
                 break
-            current = self._revise_with_feedback(question, current, feedback)
-        return current
+            revisions = await asyncio.gather(*[self._arevise_with_feedback(question, current[i], feedbacks[i], k, checkpoint) for i in to_revise])
+            for i, (evaluation, revision) in zip(to_revise, revisions):
+                current[i] = revision
+                if evaluation is None:
+                    unscored.append(i)
+                else:
+                    scores[i], feedbacks[i] = evaluation
+        
+        order = sorted(range(len(current)), key=lambda i: scores[i], reverse=True)
+        kept = [i for i in order if scores[i] >= MERGE_SCORE_FLOOR or i in unscored] or order[:1]
+        return [(scores[i], current[i]) for i in kept]
     
-    def _revise_with_feedback(self, question: str, answer: str, feedback: str) -> str:
-        """Revise answer based on feedback."""
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "Improve answer based on feedback."),
-            ("user", "Question: {question}\nAnswer: {answer}\nFeedback: {feedback}\n\nImproved:")
-        ])
-        return (prompt | self.model).invoke({"question": question, "answer": answer, "feedback": feedback}).content
+    async def _aevaluate(self, question: str, answers: List[str], checkpoint: Optional[Path] = None) -> List[Tuple[float, str]]:
+        """Score answers in one batched evaluator call (checkpointed)."""
+        return await self._acheckpoint(checkpoint, "evaluate", {"answers": answers}, lambda: self.evaluator.aevaluate_answers(question, answers))
+    
+    async def _arevise_with_feedback(self, question: str, answer: str, feedback: str, k: int = 1, checkpoint: Optional[Path] = None) -> Tuple[Optional[Tuple[float, str]], str]:
+        """Revise answer based on feedback (checkpointed): (evaluation, revision).
+        
+        With k > 1, the best of k concurrently scored revisions and its evaluation; otherwise one unscored revision.
+        """
+        inputs = {"question": question, "answer": answer, "feedback": feedback}
+        if k <= 1:
+            return None, await self._acheckpoint(checkpoint, "revise", inputs, lambda: self._acontent(self._revise_chain, inputs))
+        
+        async def revise() -> Tuple[float, str, str]:
+            responses = await self._revise_chain.abatch([inputs] * k, config={"max_concurrency": k})
+            # Samples that still coincide are scored once.
+            candidates = list(dict.fromkeys(r.content for r in responses))
+            evaluations = await asyncio.gather(*[self.evaluator.aevaluate_answer(question, c) for c in candidates])
+            best = max(range(len(candidates)), key=lambda j: evaluations[j][0])
+            return evaluations[best][0], evaluations[best][1], candidates[best]
+        
+        score, new_feedback, revision = await self._acheckpoint(checkpoint, "revise:best", {**inputs, "k": k}, revise)
+        return (score, new_feedback), revision
+    
+    async def _anear_identical(self, variants: List[str]) -> bool:
+        """True if every pair of variants is above MERGE_SIMILARITY_THRESHOLD cosine (needs embeddings)."""
+        if self.embeddings is None:
+            return False
+        try:
+            vectors = np.asarray(await self.embeddings.aembed_documents(variants), dtype=np.float32)
+        except Exception:
+            return False
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        if not norms.all():
+            return False
+        vectors /= norms
+        return float((vectors @ vectors.T).min()) > MERGE_SIMILARITY_THRESHOLD
     
-    def _merge_variants(self, question: str, variants: List[str]) -> str:
+    async def _amerge_variants(self, question: str, variants: List[str], checkpoint: Optional[Path] = None) -> str:
         """Merge evolved variants into final answer."""
+        inputs = self._merge_inputs(question, variants)
+        return await self._acheckpoint(checkpoint, "merge", inputs, lambda: self._acontent(self._merge_chain, inputs))
+    
+    async def _astream_merge(self, question: str, variants: List[str], checkpoint: Optional[Path] = None) -> AsyncIterator[str]:
+        """Stream the merge; the joined text is checkpointed like _amerge_variants."""
+        inputs = self._merge_inputs(question, variants)
+        found, merged = self._checkpoint_get(checkpoint, "merge", inputs)
+        if found:
+            yield merged
+            return
+        parts = []
+        async for chunk in self._merge_chain.astream(inputs):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+        self._checkpoint_put(checkpoint, "merge", inputs, "".join(parts))
+    
+    def _merge_inputs(self, question: str, variants: List[str]) -> Dict[str, Any]:
+        """Inputs for the merge chain."""
         variants_text = "\n\n---\n\n".join([f"Variant {i+1}:\n{v}" for i, v in enumerate(variants)])
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "Merge candidate answers into comprehensive answer. Combine best info, reconcile conflicts."),
-            ("user", "Question: {question}\nCandidates:\n{variants}")
-        ])
-        return (prompt | self.model).invoke({"question": question, "variants": variants_text}).content
-
+        return {"question": question, "variants": variants_text}
+    
+    async def _acontent(self, chain: Any, inputs: Dict[str, Any]) -> str:
+        """Invoke a prompt | model chain and return the message text."""
+        return (await chain.ainvoke(inputs)).content
+    
+    async def _acheckpoint(self, checkpoint: Optional[Path], step: str, inputs: Dict[str, Any], call: Callable[[], Awaitable[Any]]) -> Any:
+        """Return this step's checkpointed output, or run it and append the output to the run's checkpoint."""
+        found, output = self._checkpoint_get(checkpoint, step, inputs)
+        if found:
+            return output
+        output = await call()
+        self._checkpoint_put(checkpoint, step, inputs, output)
+        return output
+    
+    def _checkpoint_key(self, step: str, inputs: Dict[str, Any]) -> str:
+        """A step's key within a checkpoint file."""
+        return _sha256(step, orjson.dumps(inputs, option=orjson.OPT_SORT_KEYS).decode())
+    
+    def _checkpoint_get(self, checkpoint: Optional[Path], step: str, inputs: Dict[str, Any]) -> Tuple[bool, Any]:
+        """(found, output) for a step; never found without a checkpoint."""
+        if checkpoint is None:
+            return False, None
+        key = self._checkpoint_key(step, inputs)
+        done = self._load_checkpoint(checkpoint)
+        return (True, done[key]) if key in done else (False, None)
+    
+    def _checkpoint_put(self, checkpoint: Optional[Path], step: str, inputs: Dict[str, Any], output: Any):
+        """Append a completed step's output to the run's checkpoint."""
+        if checkpoint is None:
+            return
+        key = self._checkpoint_key(step, inputs)
+        with checkpoint.open("ab") as f:
+            f.write(orjson.dumps({"step": step, "key": key, "output": output}) + b"\n")
+        self._load_checkpoint(checkpoint)[key] = output
+    
+    def _claim_checkpoint(self, question: str) -> Optional[Path]:
+        """Checkpoint file for a new evolve of question with this model (None without a cache_dir).
+        
+        That is the file a retry resumes from, or a numbered sibling while another evolve of the question holds it.
+        """
+        if self.cache_dir is None:
+            return None
+        base = _sha256(self._identity, question)
+        with _ACTIVE_LOCK:
+            slot = 0
+            while (path := self.cache_dir / (f"{base}.jsonl" if slot == 0 else f"{base}-{slot}.jsonl")) in _ACTIVE_CHECKPOINTS:
+                slot += 1
+            _ACTIVE_CHECKPOINTS.add(path)
+        return path
+    
+    def _release_checkpoint(self, checkpoint: Optional[Path]):
+        """Let later evolves of the question use the checkpoint file again."""
+        with _ACTIVE_LOCK:
+            _ACTIVE_CHECKPOINTS.discard(checkpoint)
+    
+    def _clear_checkpoint(self, checkpoint: Optional[Path]):
+        """Drop a completed evolve's checkpoint from disk and memory."""
+        if checkpoint is None:
+            return
+        self._checkpoints.pop(checkpoint, None)
+        checkpoint.unlink(missing_ok=True)
+    
+    def _expire_checkpoints(self):
+        """Delete checkpoints of evolves that failed and were not retried within CHECKPOINT_TTL."""
+        cutoff = time.time() - CHECKPOINT_TTL
+        for path in self.cache_dir.glob("*.jsonl"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                continue
+    
+    def _load_checkpoint(self, path: Path) -> Dict[str, Any]:
+        """Completed step outputs in one checkpoint file (LRU-memoized; a torn last line from a crash is skipped)."""
+        if path in self._checkpoints:
+            self._checkpoints.move_to_end(path)
+        else:
+            done: Dict[str, Any] = {}
+            if path.exists():
+                for line in path.read_bytes().splitlines():
+                    try:
+                        record = orjson.loads(line)
+                        done[record["key"]] = record["output"]
+                    except (orjson.JSONDecodeError, KeyError, TypeError):
+                        continue
+            self._checkpoints[path] = done
+            while len(self._checkpoints) > CHECKPOINT_MEMO_SIZE:
+                self._checkpoints.popitem(last=False)
+        return self._checkpoints[path]
@@ -1,55 +1,337 @@
 """Chroma vector store retriever for TTD-DR agent."""
 
+import importlib.util
 import pickle
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional, Tuple, Union
 
+import numpy as np
+import orjson
 from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 
+from ..utils.cache import CachedEmbeddings
+from ..utils.http import http_async_client, http_client
+
+# Latency-oriented HNSW build settings; only applied when the collection is created.
+HNSW_METADATA = {"hnsw:construction_ef": 200, "hnsw:M": 16}
+
+# Query-time HNSW candidate list size; 32 keeps recall for top_k <= 5 at roughly half the hops of 64+.
+DEFAULT_EF_SEARCH = 32
+
+# JSON manifest written by build_vector_db.ipynb; a legacy chroma_manifest.pkl alongside it is still read.
+MANIFEST_PATH = "data/vectorstores/chroma_manifest.json"
+
+# Optional int8 scalar-quantized HNSW index (faiss), built from the Chroma collection by build_vector_db.ipynb.
+FAISS_INDEX_PATH = "data/vectorstores/faiss_sq8.index"
+FAISS_DOCS_PATH = "data/vectorstores/faiss_docs.json"
+
+# Prompt-sized excerpt stored at ingest as `content_preview`; sliced on the fly for older stores.
+PREVIEW_CHARS = 300
+
+# Semantic result cache: a query whose embedding is this close to an earlier one reuses its results.
+QUERY_CACHE_THRESHOLD = 0.97
+QUERY_CACHE_SIZE = 1024
+
+# Local sentence-transformers alternatives to OpenAI; a collection must be queried with the backend it was built with.
+EmbeddingBackend = Literal["openai", "minilm", "mpnet"]
+LOCAL_EMBEDDING_MODELS = {
+    "minilm": "sentence-transformers/all-MiniLM-L6-v2",
+    "mpnet": "sentence-transformers/all-mpnet-base-v2",
+}
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """Local sentence-transformers embeddings (normalized); needs the optional `sentence-transformers` package."""
+    
+    def __init__(self, model_name: str, batch_size: int = 64):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("Local embedding backends require `pip install sentence-transformers`.") from e
+        self.model = SentenceTransformer(model_name)
+        self.batch_size = batch_size
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+@lru_cache(maxsize=None)
+def _get_embeddings(model: str, backend: EmbeddingBackend = "openai") -> Embeddings:
+    """Share one embeddings client (or loaded local model) per model across retriever instances.
+    
+    Query embeddings persist across runs (sqlite + in-process LRU), so repeated questions skip the API;
+    OpenAI requests go through the shared pooled HTTP clients.
+    """
+    base = OpenAIEmbeddings(model=model, http_client=http_client, http_async_client=http_async_client) if backend == "openai" else SentenceTransformerEmbeddings(model)
+    return CachedEmbeddings(base, namespace=model)
+
+
+@lru_cache(maxsize=None)
+def _get_store(collection_name: str, persist_directory: str, model: str, backend: EmbeddingBackend = "openai", ef_search: int = DEFAULT_EF_SEARCH) -> Tuple[Embeddings, Chroma]:
+    """Process-wide (embeddings, vector store) per collection, so the persisted HNSW index is loaded once.
+    
+    `ef_search` only takes effect when this creates the collection; an existing collection keeps its own.
+    """
+    embeddings = _get_embeddings(model, backend)
+    vector_store = Chroma(
+        collection_name=collection_name,
+        embedding_function=embeddings,
+        persist_directory=persist_directory,
+        collection_metadata={**HNSW_METADATA, "hnsw:search_ef": ef_search}
+    )
+    return embeddings, vector_store
+
+
+def _load_manifest(manifest_path: Path) -> Dict[str, Any]:
+    """Read the retrieval manifest written by build_vector_db.ipynb (JSON, or a legacy pickle)."""
+    legacy_path = manifest_path.with_suffix(".pkl")
+    if not manifest_path.exists() and legacy_path.exists():
+        manifest_path = legacy_path
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"Manifest not found at {manifest_path}. Run build_vector_db.ipynb to create it.")
+    if manifest_path.suffix == ".pkl":
+        with manifest_path.open("rb") as f:
+            return pickle.load(f)
+    return orjson.loads(manifest_path.read_bytes())
+
+
+def _resolve_backend(manifest: Dict[str, Any], embedding_backend: Optional[EmbeddingBackend]) -> EmbeddingBackend:
+    """The manifest's embedding backend; requesting another one is an error, since the store would need a rebuild."""
+    backend = manifest.get("embedding_backend", "openai")
+    if embedding_backend and embedding_backend != backend:
+        raise ValueError(f"Collection was built with the '{backend}' embedding backend; rebuild it with build_vector_db.ipynb to use '{embedding_backend}'.")
+    return backend
+
+
+def _format_results(documents: List[str], metadatas: List[Dict[str, Any]], distances: List[float]) -> List[Dict[str, Any]]:
+    """Shape one query's results into the retriever's document dicts."""
+    # Raw collection queries return None metadata for chunks stored without any.
+    metadatas = [metadata or {} for metadata in metadatas]
+    return [{
+        "content": content,
+        "preview": metadata.get("content_preview") or content[:PREVIEW_CHARS],
+        "metadata": {
+            "source": metadata.get("source", "Unknown"),
+            "name": metadata.get("name", "Unknown"),
+            "provider": metadata.get("provider", ""),
+            "notes": metadata.get("notes", ""),
+            "score": float(score)
+        }
+    } for content, metadata, score in zip(documents, metadatas, distances)]
+
+
+def _l2_normalize(vectors: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """(row-wise unit float32 vectors, their original norms); zero rows stay zero."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0), norms
+
+
+def rerank(query_vec: Any, doc_vecs: Any, normalized: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """Order documents by cosine similarity to the query: (indices best-first, their scores).
+    
+    One BLAS matrix-vector product over a float32 matrix; pass `normalized=True` with doc vectors that are
+    already unit length (e.g. cached alongside the collection) to skip normalizing them again.
+    """
+    query, _ = _l2_normalize(query_vec)
+    docs = np.asarray(doc_vecs, dtype=np.float32) if normalized else _l2_normalize(doc_vecs)[0]
+    scores = docs @ query[0]
+    order = np.argsort(-scores, kind="stable")
+    return order, scores[order]
+
+
+class _SemanticQueryCache:
+    """Fixed-size FIFO of (normalized query vector, top_k) -> results, searched by exact inner product."""
+    
+    def __init__(self, threshold: float = QUERY_CACHE_THRESHOLD, size: int = QUERY_CACHE_SIZE):
+        self.threshold = threshold
+        self.size = size
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._top_k = np.zeros(size, dtype=np.int32)
+        self._results: List[Optional[List[Dict[str, Any]]]] = [None] * size
+        self._count = 0
+        self._next = 0
+    
+    def get(self, vector: np.ndarray, top_k: int) -> Optional[List[Dict[str, Any]]]:
+        """Results of the most similar cached query with the same top_k, if above threshold."""
+        with self._lock:
+            if self._vectors is None or not self._count:
+                return None
+            scores = self._vectors[:self._count] @ vector
+            scores[self._top_k[:self._count] != top_k] = -1.0
+            best = int(np.argmax(scores))
+            return self._results[best] if scores[best] >= self.threshold else None
+    
+    def put(self, vector: np.ndarray, top_k: int, results: List[Dict[str, Any]]):
+        """Insert, overwriting the oldest entry once full."""
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.size, vector.shape[0]), dtype=np.float32)
+            self._vectors[self._next] = vector
+            self._top_k[self._next] = top_k
+            self._results[self._next] = results
+            self._next = (self._next + 1) % self.size
+            self._count = min(self._count + 1, self.size)
+
 
 class ChromaRetriever:
     """Retrieves documents from persisted Chroma vector store."""
     
-    def __init__(self, manifest_path: str = "data/vectorstores/chroma_manifest.pkl", persist_directory: str = "data/vectorstores/chroma_feasibility"):
-        """Initialize Chroma retriever with manifest and persistence directory."""
+    def __init__(self, manifest_path: str = MANIFEST_PATH, persist_directory: str = "data/vectorstores/chroma_feasibility", embedding_backend: Optional[EmbeddingBackend] = None, ef_search: int = DEFAULT_EF_SEARCH):
+        """Initialize Chroma retriever with manifest and persistence directory (embedding backend defaults to the manifest's).
+        
+        `ef_search` is the HNSW query-time candidate list size (lower is faster, higher recalls more). It is a
+        store-level setting fixed when the collection is created (see build_vector_db.ipynb), so it only applies
+        to a new collection; `self.ef_search` reports the value the collection actually uses.
+        """
         self.manifest_path = Path(manifest_path)
         self.persist_directory = Path(persist_directory)
-        
-        if not self.manifest_path.exists():
-            raise FileNotFoundError(f"Manifest not found at {self.manifest_path}. Run build_vector_db.ipynb to create it.")
-        
-        with self.manifest_path.open("rb") as f:
-            self.manifest = pickle.load(f)
-        
-        self.embeddings = OpenAIEmbeddings(model=self.manifest["embedding_model"])
-        self.vector_store = Chroma(
-            collection_name=self.manifest["collection_name"],
-            embedding_function=self.embeddings,
-            persist_directory=str(self.persist_directory)
+        self.manifest = _load_manifest(self.manifest_path)
+        self.embedding_backend = _resolve_backend(self.manifest, embedding_backend)
+        self.embeddings, self.vector_store = _get_store(
+            self.manifest["collection_name"],
+            str(self.persist_directory.resolve()),
+            self.manifest["embedding_model"],
+            self.embedding_backend,
+            ef_search
         )
+        self.ef_search = (self.vector_store._collection.metadata or {}).get("hnsw:search_ef", ef_search)
+        self._query_cache = _SemanticQueryCache()
+    
+    def warmup(self):
+        """Load the persisted HNSW index up front so the first query doesn't pay for it (best effort)."""
+        try:
+            sample = self.vector_store._collection.peek(limit=1)
+            embeddings = sample.get("embeddings")
+            if embeddings is not None and len(embeddings):
+                self.vector_store._collection.query(query_embeddings=[list(embeddings[0])], n_results=1, include=[])
+        except Exception:
+            pass
     
     def retrieve(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
         """Retrieve relevant documents for query."""
-        results = self.vector_store.similarity_search_with_score(query, k=top_k)
-        return [{
-            "content": doc.page_content,
-            "metadata": {
-                "source": doc.metadata.get("source", "Unknown"),
-                "name": doc.metadata.get("name", "Unknown"),
-                "provider": doc.metadata.get("provider", ""),
-                "notes": doc.metadata.get("notes", ""),
-                "score": float(score)
-            }
-        } for doc, score in results]
+        return self.retrieve_batch([query], top_k)[0]
+    
+    def retrieve_batch(self, queries: List[str], top_k: int = 3) -> List[List[Dict[str, Any]]]:
+        """Retrieve for several queries with one embedding request and one Chroma query for the cache misses."""
+        embeddings = self.embeddings.embed_documents([" ".join(q.split()) for q in queries])
+        vectors, norms = _l2_normalize(embeddings)
+        
+        docs: List[Optional[List[Dict[str, Any]]]] = [self._query_cache.get(v, top_k) if n else None for v, n in zip(vectors, norms[:, 0])]
+        missing = [i for i, d in enumerate(docs) if d is None]
+        if missing:
+            results = self.vector_store._collection.query(
+                query_embeddings=[embeddings[i] for i in missing],
+                n_results=top_k,
+                include=["documents", "metadatas", "distances"]
+            )
+            for j, i in enumerate(missing):
+                docs[i] = _format_results(results["documents"][j], results["metadatas"][j], results["distances"][j])
+                if norms[i, 0]:
+                    self._query_cache.put(vectors[i], top_k, docs[i])
+        return docs
     
     def get_manifest_summary(self) -> Dict[str, Any]:
         """Return manifest metadata."""
         return {
             "collection_name": self.manifest["collection_name"],
+            "embedding_backend": self.embedding_backend,
             "embedding_model": self.manifest["embedding_model"],
             "chunk_size": self.manifest["chunk_size"],
             "chunk_overlap": self.manifest["chunk_overlap"],
             "generated_at": self.manifest["generated_at"],
             "num_documents": len(self.manifest.get("document_summary", []))
         }
+
+
+class FAISSRetriever:
+    """Retrieves documents from an int8 scalar-quantized faiss HNSW index (optional `faiss-cpu` dependency).
+    
+    Same interface as ChromaRetriever; the index and its document sidecar are exported from the Chroma
+    collection by build_vector_db.ipynb, so the manifest (and embedding model) is shared. The export is
+    recorded in the manifest as `faiss_index`, and an index that doesn't match it raises ValueError.
+    """
+    
+    def __init__(self, manifest_path: str = MANIFEST_PATH, index_path: str = FAISS_INDEX_PATH, docs_path: str = FAISS_DOCS_PATH, embedding_backend: Optional[EmbeddingBackend] = None, ef_search: int = DEFAULT_EF_SEARCH):
+        """Load the faiss index, its aligned documents, and the manifest's embedding model."""
+        try:
+            import faiss
+        except ImportError as e:
+            raise ImportError("FAISSRetriever requires `pip install faiss-cpu`.") from e
+        self.manifest_path = Path(manifest_path)
+        self.index_path = Path(index_path)
+        self.docs_path = Path(docs_path)
+        if not self.index_path.exists() or not self.docs_path.exists():
+            raise FileNotFoundError(f"FAISS index not found at {self.index_path}. Run the FAISS cell in build_vector_db.ipynb to create it.")
+        
+        self.manifest = _load_manifest(self.manifest_path)
+        self.embedding_backend = _resolve_backend(self.manifest, embedding_backend)
+        self.embeddings = _get_embeddings(self.manifest["embedding_model"], self.embedding_backend)
+        self.index = faiss.read_index(str(self.index_path))
+        self.docs = orjson.loads(self.docs_path.read_bytes())
+        _check_faiss_export(self.manifest, self.embedding_backend, self.index.d, self.index.ntotal, len(self.docs))
+        faiss.ParameterSpace().set_index_parameter(self.index, "efSearch", ef_search)
+        self.ef_search = ef_search
+    
+    def warmup(self):
+        """No-op: the index is fully loaded in memory at construction."""
+    
+    def retrieve(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        """Retrieve relevant documents for query."""
+        return self.retrieve_batch([query], top_k)[0]
+    
+    def retrieve_batch(self, queries: List[str], top_k: int = 3) -> List[List[Dict[str, Any]]]:
+        """Retrieve for several queries with one embedding request and one index search."""
+        vectors, _ = _l2_normalize(self.embeddings.embed_documents([" ".join(q.split()) for q in queries]))
+        similarities, ids = self.index.search(vectors, top_k)
+        results = []
+        for row_sims, row_ids in zip(similarities, ids):
+            hits = [(self.docs[i], 1.0 - float(sim)) for sim, i in zip(row_sims, row_ids) if i >= 0]
+            results.append(_format_results([d["content"] for d, _ in hits], [d["metadata"] for d, _ in hits], [dist for _, dist in hits]))
+        return results
+    
+    def get_manifest_summary(self) -> Dict[str, Any]:
+        """Return manifest metadata."""
+        return {
+            "collection_name": self.manifest["collection_name"],
+            "embedding_backend": self.embedding_backend,
+            "embedding_model": self.manifest["embedding_model"],
+            "index": str(self.index_path),
+            "num_vectors": self.index.ntotal,
+            "generated_at": self.manifest["generated_at"],
+            "num_documents": len(self.manifest.get("document_summary", []))
+        }
+
+
+def _check_faiss_export(manifest: Dict[str, Any], backend: EmbeddingBackend, dimension: int, ntotal: int, num_docs: int):
+    """Raise ValueError unless the loaded index is the export recorded in the manifest for its current embeddings."""
+    export = manifest.get("faiss_index")
+    if not export:
+        raise ValueError("Manifest has no FAISS export record; the index predates the current collection. Rebuild it with build_vector_db.ipynb.")
+    expected = {"embedding_backend": backend, "embedding_model": manifest["embedding_model"], "dimension": dimension, "ntotal": ntotal}
+    mismatched = {k: (export.get(k), v) for k, v in expected.items() if export.get(k) != v}
+    if num_docs != ntotal:
+        mismatched["docs"] = (ntotal, num_docs)
+    if mismatched:
+        raise ValueError(f"FAISS index does not match the manifest (recorded, actual): {mismatched}. Rebuild it with build_vector_db.ipynb.")
+
+
+def load_retriever(**kwargs) -> Union[FAISSRetriever, ChromaRetriever]:
+    """FAISSRetriever when faiss is installed and its index loads and matches the manifest, otherwise ChromaRetriever."""
+    if importlib.util.find_spec("faiss") is not None and Path(kwargs.get("index_path", FAISS_INDEX_PATH)).exists():
+        try:
+            return FAISSRetriever(**{k: v for k, v in kwargs.items() if k != "persist_directory"})
+        except (ValueError, RuntimeError, OSError, orjson.JSONDecodeError) as e:
+            # Stale, corrupt or unreadable index / document sidecar.
+            print(f"Falling back to Chroma: {e}")
+    kwargs.pop("index_path", None)
+    kwargs.pop("docs_path", None)
+    return ChromaRetriever(**kwargs)
@@ -3,7 +3,7 @@ TTD-DR Tools Module
 Provides web search and other tools for the agent.
 """
 
-from .tools import web_search_tool
+from .tools import search_many, web_search_tool
 
-__all__ = ["web_search_tool"]
+__all__ = ["search_many", "web_search_tool"]
 
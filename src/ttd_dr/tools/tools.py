@@ -1,9 +1,126 @@
 """Tavily Search Tools for TTD-DR Feasibility Agent."""
 
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import orjson
 from langchain_tavily import TavilySearch
 from dotenv import load_dotenv
 
 load_dotenv()
 
-web_search_tool = TavilySearch(max_results=2, topic="news")
+_SEARCH_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_SEARCH_CACHE_SIZE = 256
+_MEMORY_LOCK = threading.Lock()
+
+# Tool settings that change what Tavily returns; part of the cache key so differently configured tools never share entries.
+_RESULT_FIELDS = ("max_results", "topic", "search_depth", "time_range", "include_domains", "exclude_domains", "include_answer", "include_raw_content", "include_images", "include_image_descriptions")
+
+# Results also persist across runs in sqlite for a day, so re-researching an address skips repeat searches.
+SEARCH_CACHE_PATH = Path.home() / ".cache" / "ttd_dr" / "tavily.sqlite"
+SEARCH_CACHE_TTL = 24 * 3600
+_DISK_LOCK = threading.Lock()
+_disk: Optional[sqlite3.Connection] = None
+
+# Concurrent Tavily requests per search_many call, to stay under the API rate limit.
+SEARCH_CONCURRENCY = 8
+
+
+def _cache_key(query: str, kwargs: Dict[str, Any]) -> str:
+    """Normalize query (case, whitespace, trailing punctuation) plus any extra search params."""
+    normalized = re.sub(r"\s+", " ", query).strip().lower().rstrip("?.! ")
+    return f"{normalized}|{sorted((k, repr(v)) for k, v in kwargs.items() if v is not None)}"
+
+
+def _disk_cache() -> sqlite3.Connection:
+    """Open the persistent search cache on first use. Caller holds _DISK_LOCK."""
+    global _disk
+    if _disk is None:
+        SEARCH_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _disk = sqlite3.connect(str(SEARCH_CACHE_PATH), check_same_thread=False)
+        _disk.execute("CREATE TABLE IF NOT EXISTS searches (key TEXT PRIMARY KEY, result BLOB, ts INTEGER)")
+        _disk.execute("DELETE FROM searches WHERE ts < ?", (int(time.time() - SEARCH_CACHE_TTL),))
+        _disk.commit()
+    return _disk
+
+
+def _lookup(key: str) -> Optional[Dict[str, Any]]:
+    """Cached result from memory, else from sqlite if younger than SEARCH_CACHE_TTL."""
+    with _MEMORY_LOCK:
+        if key in _SEARCH_CACHE:
+            _SEARCH_CACHE.move_to_end(key)
+            return _SEARCH_CACHE[key]
+    with _DISK_LOCK:
+        row = _disk_cache().execute("SELECT result FROM searches WHERE key = ? AND ts >= ?", (hashlib.sha256(key.encode("utf-8")).hexdigest(), int(time.time() - SEARCH_CACHE_TTL))).fetchone()
+    return _remember_in_memory(key, orjson.loads(row[0])) if row else None
+
+
+def _remember_in_memory(key: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    with _MEMORY_LOCK:
+        _SEARCH_CACHE[key] = result
+        while len(_SEARCH_CACHE) > _SEARCH_CACHE_SIZE:
+            _SEARCH_CACHE.popitem(last=False)
+    return result
+
+
+def _remember(key: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    if "error" not in result:
+        _remember_in_memory(key, result)
+        try:
+            blob = orjson.dumps(result)
+        except TypeError:
+            return result
+        with _DISK_LOCK:
+            _disk_cache().execute("INSERT OR REPLACE INTO searches VALUES (?, ?, ?)", (hashlib.sha256(key.encode("utf-8")).hexdigest(), blob, int(time.time())))
+            _disk_cache().commit()
+    return result
+
+
+class CachedTavilySearch(TavilySearch):
+    """TavilySearch with an in-process LRU plus a 24h sqlite cache, keyed on the normalized query and search settings."""
+    
+    def _key(self, query: str, kwargs: Dict[str, Any]) -> str:
+        """Cache key from the query, the tool's result-shaping settings and any per-call overrides."""
+        return _cache_key(query, {**{name: getattr(self, name, None) for name in _RESULT_FIELDS}, **kwargs})
+    
+    def _run(self, query: str, **kwargs) -> Dict[str, Any]:
+        key = self._key(query, kwargs)
+        cached = _lookup(key)
+        if cached is not None:
+            return cached
+        return _remember(key, super()._run(query, **kwargs))
+    
+    async def _arun(self, query: str, **kwargs) -> Dict[str, Any]:
+        key = self._key(query, kwargs)
+        cached = _lookup(key)
+        if cached is not None:
+            return cached
+        return _remember(key, await super()._arun(query, **kwargs))
+
+
+web_search_tool = CachedTavilySearch(max_results=2, topic="news")
+
 
+async def search_many(queries: List[str], max_concurrency: int = SEARCH_CONCURRENCY) -> Dict[str, Dict[str, Any]]:
+    """Run several web searches concurrently (bounded by a semaphore); returns query -> results.
+    
+    A failed search maps to {"error": ...} like the tool's own error payload, so one failure doesn't sink the batch.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    unique = list(dict.fromkeys(queries))
+    
+    async def search(query: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await web_search_tool.ainvoke({"query": query})
+            except Exception as e:
+                return {"error": str(e)}
+    
+    return dict(zip(unique, await asyncio.gather(*[search(q) for q in unique])))
@@ -2,3 +2,9 @@
 Utility functions and helpers.
 """
 
+from .cache import CachedEmbeddings, ResponseCache
+from .http import make_chat_model
+from .parsing import extract_json_array
+from .tokens import truncate_tokens
+
+__all__ = ["CachedEmbeddings", "ResponseCache", "extract_json_array", "make_chat_model", "truncate_tokens"]
@@ -0,0 +1,180 @@
+"""Persistent LLM response and embedding caches, with exact and semantic (embedding) lookup."""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "ttd_dr" / "responses.sqlite"
+DEFAULT_EMBEDDINGS_PATH = Path.home() / ".cache" / "ttd_dr" / "embeddings.sqlite"
+
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier response cache: exact SHA-256 match, then cosine similarity within a namespace.
+
+    Entries are scoped by namespace (e.g. one per prompt kind and address) so fuzzy hits
+    never cross into unrelated prompts. Fuzzy lookup is opt-in per call and needs `embeddings`;
+    callers that already hold the text's normalized vector (see `embed`) can pass it to skip
+    re-embedding. `ttl` on lookup treats entries older than that many seconds as misses.
+    """
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, embeddings: Optional[Embeddings] = None, threshold: float = 0.97, maxsize: int = 512):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._vectors: Dict[str, Tuple[List[str], Optional[np.ndarray], np.ndarray]] = {}
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, namespace TEXT, response TEXT, embedding BLOB, ts INTEGER)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_namespace ON responses (namespace)")
+        self._conn.commit()
+
+    def get(self, namespace: str, text: str, fuzzy: bool = False, ttl: Optional[float] = None, vector: Optional[np.ndarray] = None) -> Optional[str]:
+        """Return cached response for text, or for a near-identical text if fuzzy; entries older than ttl are ignored."""
+        key = _hash(namespace, text)
+        cutoff = int(time.time() - ttl) if ttl is not None else None
+        with self._lock:
+            if key in self._memory and (cutoff is None or self._memory[key][1] >= cutoff):
+                self._memory.move_to_end(key)
+                return self._memory[key][0]
+            row = self._conn.execute("SELECT response, ts FROM responses WHERE key = ?", (key,)).fetchone()
+        if row and (cutoff is None or row[1] >= cutoff):
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+        if not (fuzzy and self.embeddings):
+            return None
+        if vector is None:
+            vector = self.embed(text)
+            if vector is None:
+                return None
+        with self._lock:
+            keys, matrix, stamps = self._namespace_vectors(_hash(namespace))
+            if matrix is None:
+                return None
+            scores = matrix @ vector
+            if cutoff is not None:
+                scores[stamps < cutoff] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (keys[best],)).fetchone()
+        return row[0] if row else None
+
+    def put(self, namespace: str, text: str, response: str, fuzzy: bool = False, vector: Optional[np.ndarray] = None):
+        """Store response; fuzzy entries also store the text embedding."""
+        key, ns, now = _hash(namespace, text), _hash(namespace), int(time.time())
+        if not fuzzy:
+            vector = None
+        elif vector is None:
+            vector = self.embed(text)
+        blob = vector.astype(np.float32).tobytes() if vector is not None else None
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, ns, response, blob, now))
+            self._conn.commit()
+            if vector is not None and ns in self._vectors:
+                keys, matrix, stamps = self._vectors[ns]
+                self._vectors[ns] = (keys + [key], vector[None, :] if matrix is None else np.vstack([matrix, vector]), np.append(stamps, now))
+        self._remember(key, response, now)
+
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """Normalized embedding of text as used for fuzzy lookup, or None if unavailable."""
+        if not self.embeddings:
+            return None
+        try:
+            vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        except Exception:
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _remember(self, key: str, response: str, ts: int):
+        with self._lock:
+            self._memory[key] = (response, ts)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def _namespace_vectors(self, ns: str) -> Tuple[List[str], Optional[np.ndarray], np.ndarray]:
+        """Load (and memoize) normalized embeddings and timestamps for a namespace. Caller holds the lock."""
+        if ns not in self._vectors:
+            rows = self._conn.execute("SELECT key, embedding, ts FROM responses WHERE namespace = ? AND embedding IS NOT NULL", (ns,)).fetchall()
+            keys = [k for k, _, _ in rows]
+            matrix = np.vstack([np.frombuffer(b, dtype=np.float32) for _, b, _ in rows]) if rows else None
+            stamps = np.array([ts for _, _, ts in rows], dtype=np.int64)
+            self._vectors[ns] = (keys, matrix, stamps)
+        return self._vectors[ns]
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings adapter that persists vectors in sqlite, keyed by SHA-256 of namespace (model) + text.
+    
+    Hot keys are also kept in an in-process LRU; sqlite rows older than `ttl` seconds are treated as misses.
+    """
+    
+    def __init__(self, embeddings: Embeddings, namespace: str, path: Path = DEFAULT_EMBEDDINGS_PATH, ttl: float = 30 * 24 * 3600, maxsize: int = 1024):
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB, ts INTEGER)")
+        self._conn.execute("DELETE FROM embeddings WHERE ts < ?", (int(time.time() - ttl),))
+        self._conn.commit()
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, served from cache when possible."""
+        return self.embed_documents([text])[0]
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts; only cache misses are sent to the underlying model, in one batch."""
+        keys = [_hash(self.namespace, t) for t in texts]
+        vectors: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    vectors[key] = self._memory[key]
+            missing = [k for k in dict.fromkeys(keys) if k not in vectors]
+            if missing:
+                cutoff = int(time.time() - self.ttl)
+                placeholders = ",".join("?" * len(missing))
+                rows = self._conn.execute(f"SELECT key, vec FROM embeddings WHERE key IN ({placeholders}) AND ts >= ?", (*missing, cutoff)).fetchall()
+                for key, blob in rows:
+                    vectors[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        
+        todo = {k: t for k, t in zip(keys, texts) if k not in vectors}
+        if todo:
+            embedded = self.embeddings.embed_documents(list(todo.values()))
+            now = int(time.time())
+            with self._lock:
+                self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", [(k, np.asarray(v, dtype=np.float32).tobytes(), now) for k, v in zip(todo, embedded)])
+                self._conn.commit()
+            vectors.update(zip(todo, embedded))
+        
+        with self._lock:
+            for key in keys:
+                self._memory[key] = vectors[key]
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+        return [vectors[k] for k in keys]
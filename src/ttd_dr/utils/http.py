@@ -0,0 +1,22 @@
+"""Process-wide pooled HTTP clients for OpenAI models and embeddings."""
+
+import importlib.util
+from typing import Any
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+# One keep-alive connection pool per process for every OpenAI client, so the many back-to-back
+# LLM calls reuse warm TLS connections. HTTP/2 multiplexing only when the `h2` extra is installed.
+_HTTP2 = importlib.util.find_spec("h2") is not None
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+# Only connecting is kept tight: reads match the OpenAI SDK's 600s default, since long
+# non-streamed generations (draft, denoise, merge) would otherwise time out and be retried.
+_HTTP_TIMEOUT = httpx.Timeout(600, connect=10)
+http_client = httpx.Client(http2=_HTTP2, limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+http_async_client = httpx.AsyncClient(http2=_HTTP2, limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+
+
+def make_chat_model(model_name: str = "gpt-4o-mini", temperature: float = 0.0, **kwargs: Any) -> ChatOpenAI:
+    """ChatOpenAI bound to the shared pooled httpx clients; the recommended way to build SelfEvolution's model."""
+    return ChatOpenAI(model=model_name, temperature=temperature, http_client=http_client, http_async_client=http_async_client, **kwargs)
@@ -0,0 +1,16 @@
+"""Helpers for parsing structured output from LLM responses."""
+
+import json
+from typing import Any, List, Optional
+
+
+def extract_json_array(content: str) -> Optional[List[Any]]:
+    """Parse a JSON array from LLM output, tolerating surrounding prose or code fences."""
+    start, end = content.find('['), content.rfind(']') + 1
+    if start == -1 or end <= start:
+        return None
+    try:
+        parsed = json.loads(content[start:end])
+    except json.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, list) else None
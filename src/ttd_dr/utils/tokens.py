@@ -0,0 +1,21 @@
+"""Token-budget helpers backed by tiktoken."""
+
+from functools import lru_cache
+
+import tiktoken
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = "gpt-4o-mini") -> tiktoken.Encoding:
+    """Return (and cache) the tokenizer for model, defaulting to o200k_base for unknown names."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> str:
+    """Trim text to at most max_tokens tokens, leaving it untouched if it already fits."""
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
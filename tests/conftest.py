@@ -0,0 +1,8 @@
+"""Make the `ttd_dr` package under src/ importable in tests."""
+
+import sys
+from pathlib import Path
+
+src_path = Path(__file__).parent.parent / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
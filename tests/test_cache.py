@@ -0,0 +1,83 @@
+"""Tests for the persistent response and embedding caches."""
+
+import sqlite3
+import time
+from typing import List
+
+from ttd_dr.utils.cache import CachedEmbeddings, ResponseCache
+
+
+class CountingEmbeddings:
+    """Deterministic 3-d embeddings keyed on the first word; counts calls."""
+    
+    def __init__(self):
+        self.calls = 0
+        self.batches: List[List[str]] = []
+    
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return {"oak": [1.0, 0.0, 0.0], "elm": [0.0, 1.0, 0.0]}.get(text.split()[0].lower(), [0.0, 0.0, 1.0])
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.batches.append(list(texts))
+        return [self.embed_query(t) for t in texts]
+
+
+def test_response_cache_exact_and_fuzzy(tmp_path):
+    cache = ResponseCache(tmp_path / "r.sqlite", embeddings=CountingEmbeddings())
+    cache.put("answer", "oak zoning?", "R-2", fuzzy=True)
+    assert cache.get("answer", "oak zoning?") == "R-2"
+    assert cache.get("answer", "oak zoning rules?", fuzzy=True) == "R-2"
+    assert cache.get("answer", "elm zoning?", fuzzy=True) is None
+    assert cache.get("other", "oak zoning rules?", fuzzy=True) is None
+
+
+def test_response_cache_reuses_supplied_vector(tmp_path):
+    embeddings = CountingEmbeddings()
+    cache = ResponseCache(tmp_path / "r.sqlite", embeddings=embeddings)
+    vector = cache.embed("oak zoning?")
+    assert cache.get("answer", "oak zoning?", fuzzy=True, vector=vector) is None
+    cache.put("answer", "oak zoning?", "R-2", fuzzy=True, vector=vector)
+    assert embeddings.calls == 1
+    assert cache.get("answer", "oak zoning now?", fuzzy=True, vector=vector) == "R-2"
+
+
+def test_response_cache_ttl(tmp_path):
+    path = tmp_path / "r.sqlite"
+    cache = ResponseCache(path, embeddings=CountingEmbeddings())
+    cache.put("answer", "oak zoning?", "R-2", fuzzy=True)
+    with sqlite3.connect(str(path)) as conn:
+        conn.execute("UPDATE responses SET ts = ?", (int(time.time()) - 7200,))
+    
+    reopened = ResponseCache(path, embeddings=CountingEmbeddings())
+    assert reopened.get("answer", "oak zoning?", ttl=3600) is None
+    assert reopened.get("answer", "oak zoning again?", fuzzy=True, ttl=3600) is None
+    assert reopened.get("answer", "oak zoning?") == "R-2"
+
+
+def test_cached_embeddings_only_embeds_misses(tmp_path):
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner, "model", tmp_path / "e.sqlite")
+    assert cached.embed_documents(["oak a", "elm b"]) == [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]
+    assert cached.embed_documents(["elm b", "pine c", "pine c"]) == [[0.0, 1.0, 0.0], [0.0, 0.0, 1.0], [0.0, 0.0, 1.0]]
+    assert inner.batches == [["oak a", "elm b"], ["pine c"]]
+    
+    reopened_inner = CountingEmbeddings()
+    reopened = CachedEmbeddings(reopened_inner, "model", tmp_path / "e.sqlite")
+    assert reopened.embed_query("oak a") == [1.0, 0.0, 0.0]
+    assert reopened_inner.batches == []
+    
+    other_model = CachedEmbeddings(reopened_inner, "other", tmp_path / "e.sqlite")
+    other_model.embed_query("oak a")
+    assert reopened_inner.batches == [["oak a"]]
+
+
+def test_cached_embeddings_ttl(tmp_path):
+    path = tmp_path / "e.sqlite"
+    CachedEmbeddings(CountingEmbeddings(), "model", path).embed_query("oak a")
+    with sqlite3.connect(str(path)) as conn:
+        conn.execute("UPDATE embeddings SET ts = ?", (int(time.time()) - 7200,))
+    
+    inner = CountingEmbeddings()
+    CachedEmbeddings(inner, "model", path, ttl=3600).embed_query("oak a")
+    assert inner.batches == [["oak a"]]
@@ -0,0 +1,110 @@
+"""Tests for retriever helpers and the optional FAISS index."""
+
+import json
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import FakeEmbeddings
+
+from ttd_dr.retrieval import retriever
+from ttd_dr.retrieval.retriever import ChromaRetriever, FAISSRetriever, _SemanticQueryCache, _check_faiss_export, _format_results, load_retriever
+
+
+def _manifest(export=None):
+    return {
+        "collection_name": "seed",
+        "embedding_backend": "openai",
+        "embedding_model": "text-embedding-3-small",
+        "generated_at": "2025-01-01 00:00:00",
+        "faiss_index": export,
+    }
+
+
+def test_check_faiss_export_accepts_matching_index():
+    export = {"embedding_backend": "openai", "embedding_model": "text-embedding-3-small", "dimension": 8, "ntotal": 3}
+    _check_faiss_export(_manifest(export), "openai", 8, 3, 3)
+
+
+@pytest.mark.parametrize("backend, dimension, ntotal, num_docs", [
+    ("minilm", 8, 3, 3),
+    ("openai", 384, 3, 3),
+    ("openai", 8, 4, 4),
+    ("openai", 8, 3, 2),
+])
+def test_check_faiss_export_rejects_stale_index(backend, dimension, ntotal, num_docs):
+    export = {"embedding_backend": "openai", "embedding_model": "text-embedding-3-small", "dimension": 8, "ntotal": 3}
+    with pytest.raises(ValueError):
+        _check_faiss_export(_manifest(export), backend, dimension, ntotal, num_docs)
+
+
+def test_check_faiss_export_rejects_unrecorded_index():
+    with pytest.raises(ValueError):
+        _check_faiss_export(_manifest(), "openai", 8, 3, 3)
+
+
+def test_faiss_retriever_rejects_index_from_other_export(tmp_path, monkeypatch):
+    faiss = pytest.importorskip("faiss")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    vectors = np.random.default_rng(0).random((4, 8), dtype=np.float32)
+    index = faiss.IndexHNSWSQ(8, faiss.ScalarQuantizer.QT_8bit, 32, faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    index.add(vectors)
+    faiss.write_index(index, str(tmp_path / "faiss.index"))
+    (tmp_path / "docs.json").write_text(json.dumps([{"content": str(i), "metadata": {}} for i in range(4)]))
+    
+    export = {"embedding_backend": "openai", "embedding_model": "text-embedding-3-small", "dimension": 8, "ntotal": 4}
+    paths = {"index_path": str(tmp_path / "faiss.index"), "docs_path": str(tmp_path / "docs.json")}
+    (tmp_path / "manifest.json").write_text(json.dumps(_manifest(export)))
+    assert FAISSRetriever(str(tmp_path / "manifest.json"), **paths).index.ntotal == 4
+    
+    (tmp_path / "manifest.json").write_text(json.dumps(_manifest({**export, "dimension": 1536})))
+    with pytest.raises(ValueError):
+        FAISSRetriever(str(tmp_path / "manifest.json"), **paths)
+
+
+def test_semantic_query_cache_matches_near_identical_queries():
+    cache = _SemanticQueryCache(threshold=0.97, size=4)
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    cache.put(query, 3, [{"content": "a"}])
+    
+    near = np.array([0.99, 0.141], dtype=np.float32)
+    far = np.array([0.8, 0.6], dtype=np.float32)
+    assert cache.get(near / np.linalg.norm(near), 3) == [{"content": "a"}]
+    assert cache.get(far, 3) is None
+    assert cache.get(query, 5) is None
+
+
+def test_semantic_query_cache_evicts_oldest():
+    cache = _SemanticQueryCache(size=2)
+    vectors = np.eye(3, dtype=np.float32)
+    for i, vector in enumerate(vectors):
+        cache.put(vector, 3, [{"content": str(i)}])
+    assert cache.get(vectors[0], 3) is None
+    assert cache.get(vectors[2], 3) == [{"content": "2"}]
+
+
+@pytest.mark.parametrize("index_bytes, docs_text", [
+    (b"not a faiss index", "[]"),
+    (None, "{not json"),
+])
+def test_load_retriever_falls_back_to_chroma_on_unreadable_faiss_files(tmp_path, monkeypatch, index_bytes, docs_text):
+    faiss = pytest.importorskip("faiss")
+    monkeypatch.setattr(retriever, "_get_embeddings", lambda *args: FakeEmbeddings(size=8))
+    index_path, docs_path = tmp_path / "faiss.index", tmp_path / "docs.json"
+    if index_bytes is None:
+        faiss.write_index(faiss.IndexFlatIP(8), str(index_path))
+    else:
+        index_path.write_bytes(index_bytes)
+    docs_path.write_text(docs_text)
+    manifest = {**_manifest(), "collection_name": "seed_collection"}
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest))
+    
+    loaded = load_retriever(manifest_path=str(tmp_path / "manifest.json"), persist_directory=str(tmp_path / "chroma"), index_path=str(index_path), docs_path=str(docs_path))
+    assert isinstance(loaded, ChromaRetriever)
+
+
+def test_format_results_tolerates_missing_metadata():
+    results = _format_results(["chunk text"], [None], [0.25])
+    assert results[0]["preview"] == "chunk text"
+    assert results[0]["metadata"]["name"] == "Unknown"
+    assert results[0]["metadata"]["score"] == 0.25
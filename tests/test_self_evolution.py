@@ -0,0 +1,141 @@
+"""Tests for SelfEvolution's resume-after-failure checkpoints."""
+
+import asyncio
+from typing import List, Tuple
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from ttd_dr.refinement.self_evolution import SelfEvolution
+
+
+class FlakyModel:
+    """Fake chat model: returns numbered answers, and fails once on a prompt containing `fail_on`."""
+    
+    def __init__(self, fail_on: str):
+        self.fail_on = fail_on
+        self.calls: List[str] = []
+        self.runnable = RunnableLambda(self._respond)
+    
+    def _respond(self, prompt) -> AIMessage:
+        text = prompt.to_string()
+        if self.fail_on and self.fail_on in text:
+            self.fail_on = ""
+            raise RuntimeError("rate limited")
+        self.calls.append(text)
+        return AIMessage(content=f"answer {len(self.calls)}")
+
+
+class FixedEvaluator:
+    """Scores every answer 6 (below the revise threshold, above the merge floor)."""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    async def aevaluate_answers(self, question: str, answers: List[str]) -> List[Tuple[float, str]]:
+        self.calls += 1
+        return [(6.0, "add detail")] * len(answers)
+    
+    async def aevaluate_answer(self, question: str, answer: str) -> Tuple[float, str]:
+        self.calls += 1
+        return 6.0, "add detail"
+
+
+def test_retry_replays_only_completed_steps(tmp_path):
+    model, evaluator = FlakyModel(fail_on="Merge candidate answers"), FixedEvaluator()
+    evolution = SelfEvolution(model.runnable, evaluator, cache_dir=tmp_path)
+    
+    with pytest.raises(RuntimeError):
+        asyncio.run(evolution.aevolve_answer("zoning?", "draft", num_variants=2, num_iterations=1))
+    calls_before_failure, evaluations_before_failure = len(model.calls), evaluator.calls
+    assert calls_before_failure > 0
+    assert list(tmp_path.glob("*.jsonl"))
+    
+    retry = SelfEvolution(model.runnable, evaluator, cache_dir=tmp_path)
+    answer = asyncio.run(retry.aevolve_answer("zoning?", "draft", num_variants=2, num_iterations=1))
+    assert len(model.calls) == calls_before_failure + 1
+    assert "Merge candidate answers" in model.calls[-1]
+    assert evaluator.calls == evaluations_before_failure
+    assert answer == f"answer {calls_before_failure + 1}"
+
+
+def test_checkpoint_removed_after_completion(tmp_path):
+    model, evaluator = FlakyModel(fail_on=""), FixedEvaluator()
+    evolution = SelfEvolution(model.runnable, evaluator, cache_dir=tmp_path)
+    
+    asyncio.run(evolution.aevolve_answer("zoning?", "draft", num_variants=2, num_iterations=1))
+    assert not list(tmp_path.glob("*.jsonl"))
+    assert not evolution._checkpoints
+    
+    calls = len(model.calls)
+    asyncio.run(evolution.aevolve_answer("zoning?", "draft", num_variants=2, num_iterations=1))
+    assert len(model.calls) == 2 * calls
+
+
+def test_streamed_evolve_removes_checkpoint(tmp_path):
+    model, evaluator = FlakyModel(fail_on=""), FixedEvaluator()
+    evolution = SelfEvolution(model.runnable, evaluator, cache_dir=tmp_path)
+    
+    chunks = list(evolution.stream_evolve_answer("zoning?", "draft", num_variants=2, num_iterations=1))
+    assert "".join(chunks) == f"answer {len(model.calls)}"
+    assert not list(tmp_path.glob("*.jsonl"))
+
+
+def test_remaining_variants_use_one_json_array_call():
+    model, evaluator = FlakyModel(fail_on=""), FixedEvaluator()
+    evolution = SelfEvolution(model.runnable, evaluator)
+    
+    variants = asyncio.run(evolution._agenerate_variants("zoning?", "draft", 2, previous=["first"]))
+    assert len(variants) == 2
+    assert "JSON array of 2 strings" in model.calls[0]
+
+
+def _revise_calls(model: FlakyModel) -> int:
+    return sum("Improve answer based on feedback" in call for call in model.calls)
+
+
+@pytest.mark.parametrize("temperature, num_iterations, expected", [
+    (0.0, 2, 2),
+    (0.7, 1, 1),
+    (0.7, 2, 4),
+])
+def test_revision_fan_out_only_when_sampling_over_several_iterations(temperature, num_iterations, expected):
+    model, evaluator = FlakyModel(fail_on=""), FixedEvaluator()
+    model.runnable.temperature = temperature
+    evolution = SelfEvolution(model.runnable, evaluator, k_candidates=2)
+    
+    ranked = asyncio.run(evolution._aevolve_variants("zoning?", ["draft"], num_iterations, [(6.0, "add detail")]))
+    assert _revise_calls(model) == expected
+    assert len(ranked) == 1
+
+
+def test_checkpoint_not_replayed_for_another_model(tmp_path):
+    model, evaluator = FlakyModel(fail_on="Merge candidate answers"), FixedEvaluator()
+    with pytest.raises(RuntimeError):
+        asyncio.run(SelfEvolution(model.runnable, evaluator, cache_dir=tmp_path).aevolve_answer("zoning?", "draft", num_variants=2))
+    calls = len(model.calls)
+    
+    other = FlakyModel(fail_on="")
+    other.runnable.temperature = 0.7
+    asyncio.run(SelfEvolution(other.runnable, evaluator, cache_dir=tmp_path).aevolve_answer("zoning?", "draft", num_variants=2))
+    assert len(other.calls) == calls + 1
+    assert len(list(tmp_path.glob("*.jsonl"))) == 1
+
+
+def test_concurrent_evolves_of_one_question_use_separate_checkpoints(tmp_path):
+    evolution = SelfEvolution(FlakyModel(fail_on="").runnable, FixedEvaluator(), cache_dir=tmp_path)
+    first = evolution._claim_checkpoint("zoning?")
+    second = evolution._claim_checkpoint("zoning?")
+    assert first != second
+    
+    evolution._release_checkpoint(first)
+    assert evolution._claim_checkpoint("zoning?") == first
+    evolution._release_checkpoint(first)
+    evolution._release_checkpoint(second)
+    
+    async def run_both():
+        return await asyncio.gather(*[evolution.aevolve_answer("zoning?", "draft", num_variants=2) for _ in range(2)])
+    
+    assert all(answer.startswith("answer") for answer in asyncio.run(run_both()))
+    assert not list(tmp_path.glob("*.jsonl"))
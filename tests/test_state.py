@@ -0,0 +1,42 @@
+"""Tests for AgentState history views and serialization."""
+
+import orjson
+
+from ttd_dr.memory.state import AgentState
+
+
+def _state_with(n: int) -> AgentState:
+    state = AgentState(query="12 Oak Ave")
+    for i in range(1, n + 1):
+        state.add_search_result(f"q{i}", f"a{i}")
+    return state
+
+
+def test_recent_results_are_chronological():
+    state = _state_with(5)
+    assert [r.question for r in state.recent_results(3)] == ["q3", "q4", "q5"]
+    assert [r.question for r in state.recent_results(10)] == ["q1", "q2", "q3", "q4", "q5"]
+    assert state.latest_three_text == "Q: q3\nA: a3\n\nQ: q4\nA: a4\n\nQ: q5\nA: a5"
+
+
+def test_search_context_cache_invalidated_by_new_result():
+    state = _state_with(2)
+    assert state.get_search_context(1) == "Q1: q2\nA1: a2"
+    assert state.get_search_context(0) == "Q1: q1\nA1: a1\n\nQ2: q2\nA2: a2"
+    
+    state.add_search_result("q3", "a3")
+    assert state.get_search_context(1) == "Q1: q3\nA1: a3"
+    assert state.get_search_context(0).endswith("Q3: q3\nA3: a3")
+
+
+def test_to_dict_lists_history_and_omits_derived_caches():
+    state = _state_with(2)
+    state.get_search_context()
+    data = state.to_dict()
+    
+    assert isinstance(data["search_history"], list)
+    assert [r["question"] for r in data["search_history"]] == ["q1", "q2"]
+    assert set(data["search_history"][0]) == {"question", "answer", "sources", "timestamp", "score"}
+    assert "latest_three_text" not in data
+    assert "_recent_context_cache" not in data
+    assert orjson.loads(orjson.dumps(data))["query"] == "12 Oak Ave"
@@ -0,0 +1,42 @@
+"""Tests for the cached Tavily search tool."""
+
+import os
+
+import pytest
+
+os.environ.setdefault("TAVILY_API_KEY", "test")
+
+from langchain_tavily import TavilySearch  # noqa: E402
+
+from ttd_dr.tools import tools  # noqa: E402
+from ttd_dr.tools.tools import CachedTavilySearch  # noqa: E402
+
+
+@pytest.fixture
+def fake_tavily(tmp_path, monkeypatch):
+    """Isolated caches and a Tavily backend that records each search it serves."""
+    calls = []
+    
+    def search(self, query, **kwargs):
+        calls.append((query, self.max_results, self.topic))
+        return {"query": query, "results": [{"title": str(i)} for i in range(self.max_results)]}
+    
+    monkeypatch.setattr(TavilySearch, "_run", search)
+    monkeypatch.setattr(tools, "SEARCH_CACHE_PATH", tmp_path / "tavily.sqlite")
+    monkeypatch.setattr(tools, "_disk", None)
+    monkeypatch.setattr(tools, "_SEARCH_CACHE", type(tools._SEARCH_CACHE)())
+    return calls
+
+
+def test_repeated_query_is_served_from_cache(fake_tavily):
+    tool = CachedTavilySearch(max_results=2, topic="news")
+    assert tool._run("Zoning for 12 Oak Ave?") == tool._run("zoning for 12 oak ave")
+    assert len(fake_tavily) == 1
+
+
+def test_differently_configured_tools_do_not_share_entries(fake_tavily):
+    news = CachedTavilySearch(max_results=2, topic="news")
+    general = CachedTavilySearch(max_results=5, topic="general")
+    assert len(news._run("zoning")["results"]) == 2
+    assert len(general._run("zoning")["results"]) == 5
+    assert len(fake_tavily) == 2